@@ -0,0 +1,150 @@
+import argparse
+import hashlib
+import json
+import os
+import runpy
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import notebook_assets
+
+# Run from anywhere: every builder expects the repository root as its working directory
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(ROOT, ".build-manifest.json")
+
+# Each builder script and the notebook it writes
+BUILDERS = {
+    "matching/core.py": "matching/Z-INDEX-core.ipynb",
+    "reaction-balancing/core.py": "reaction-balancing/REACTION-CORE.ipynb",
+    "reaction-balancing-advanced/core.py": "reaction-balancing-advanced/REACTION-ADVANCED-CORE.ipynb",
+    "limiting-reactant/core.py": "limiting-reactant/LIMITING-REACTANT-CORE.ipynb",
+    "normalization/core.py": "normalization/NORMALIZATION-CORE.ipynb",
+    "normalization-3nf/core.py": "normalization-3nf/NORMALIZATION-ADVANCED-CORE.ipynb",
+    "lewis-structures/core.py": "lewis-structures/LEWIS-STRUCUTRES-CORE.ipynb",
+    "master-theorem/core.py": "master-theorem/MASTER-THEOREM-CORE.ipynb",
+}
+
+# Files a builder may read besides its own source (images, helper modules)
+ASSET_EXTENSIONS = (".py", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp")
+
+# Shared modules in the repository root that a builder imports
+SHARED_INPUTS = {
+    "matching/core.py": ["notebook_assets.py"],
+    "master-theorem/core.py": ["notebook_assets.py"],
+}
+
+
+def builder_inputs(builder):
+    """Returns the sorted list of files that determine a builder's output"""
+    folder = os.path.dirname(builder)
+    inputs = []
+    for name in os.listdir(os.path.join(ROOT, folder)):
+        if name.lower().endswith(ASSET_EXTENSIONS):
+            inputs.append(f"{folder}/{name}")
+    return sorted(inputs + SHARED_INPUTS.get(builder, []))
+
+
+def hash_inputs(builder):
+    digest = hashlib.sha256()
+    if "notebook_assets.py" in SHARED_INPUTS.get(builder, []):
+        # Re-encoded images also depend on the installed Pillow and its settings, not just the files
+        digest.update(notebook_assets.encoder_key().encode("utf-8"))
+    for path in builder_inputs(builder):
+        digest.update(path.encode("utf-8"))
+        with open(os.path.join(ROOT, path), "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest):
+    # Write to a temporary file first so an interrupted build never leaves a corrupt manifest
+    tmp = MANIFEST + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST)
+
+
+def run_builder(builder):
+    # Builders open their images and write their notebooks relative to the repository root,
+    # and may import helper modules that sit next to them.
+    os.chdir(ROOT)
+    sys.path.insert(0, os.path.join(ROOT, os.path.dirname(builder)))
+    runpy.run_path(os.path.join(ROOT, builder), run_name="__main__")
+    return builder
+
+
+def stale_builders(builders, manifest, force=False):
+    stale = {}
+    for builder in builders:
+        digest = hash_inputs(builder)
+        output_exists = os.path.exists(os.path.join(ROOT, BUILDERS[builder]))
+        if force or not output_exists or manifest.get(builder) != digest:
+            stale[builder] = digest
+    return stale
+
+
+def build(builders=None, jobs=None, force=False):
+    """Rebuilds every notebook whose inputs changed since the last build, returns the rebuilt builders"""
+    builders = list(builders or BUILDERS)
+    manifest = load_manifest()
+    stale = stale_builders(builders, manifest, force)
+
+    for builder in builders:
+        if builder not in stale:
+            print(f"up to date: {BUILDERS[builder]}")
+
+    if not stale:
+        return []
+
+    failed = []
+    # A fresh process per builder keeps helper modules with the same name in different folders apart
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as pool:
+        futures = {pool.submit(run_builder, builder): builder for builder in stale}
+        for future in as_completed(futures):
+            builder = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                failed.append(builder)
+                print(f"FAILED: {builder}: {e!r}")
+                continue
+            manifest[builder] = stale[builder]
+            save_manifest(manifest)
+            print(f"built: {BUILDERS[builder]}")
+
+    if failed:
+        raise SystemExit(f"{len(failed)} builder(s) failed: {', '.join(sorted(failed))}")
+    return sorted(stale)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the core notebooks, skipping those whose inputs are unchanged.")
+    parser.add_argument("targets", nargs="*",
+                        help="folders or builder scripts to build (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="rebuild even if the inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    builders = []
+    for target in args.targets:
+        target = target.strip("/")
+        builder = target if target.endswith(".py") else f"{target}/core.py"
+        if builder not in BUILDERS:
+            parser.error(f"unknown builder: {target}")
+        builders.append(builder)
+
+    build(builders, args.jobs, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
 import nbformat as nbf
+import os
+
+# The drawing code is kept in layout.py and copied into the notebook, which cannot import it
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "layout.py")) as f:
+    LAYOUT = f.read()
 
 IMPORTS = '''!pip install z3-solver
 !pip install git+https://github.com/crrivero/FormalMethodsTasting.git#subdirectory=core
@@ -82,96 +87,78 @@ MODEL_OPT = '''print( opt.model() ) # output solution'''
 
 VIEW = '''To better view the solution, we've defined a function to draw the structure. 
 
-NOTE: Bond angles are not accurate. This is only meant to display the electron placement.'''
+NOTE: Bond angles follow VSEPR theory for each atom's bonds and lone pairs, flattened to 2D.'''
+
+VIEW_CODE_OPT = '''# Tell the drawing code which variable is which
+molecule = LewisMolecule()
+c = molecule.atom('C', C)
+o1 = molecule.atom('O', O1)
+o2 = molecule.atom('O', O2)
+molecule.bond(c, o1, C_O1)
+molecule.bond(c, o2, C_O2)
 
-VIEW_CODE_OPT = '''m = opt.model()
-draw_lewis_from_model(m)'''
+m = opt.model()
+draw_lewis_from_model(m, molecule)'''
 
 VIEW_FUNCS = '''# Should be imported
-def draw_lewis_from_model(m):
-  """Converts a model to the format required by draw_lewis_structure"""
-  # List of elements
-  elements = []
-  # List of bond variables
-  bonds = []
-  lone_pairs = []
-
-  # Add element names and lone pairs to the list
-  for d in m.decls():
-    name = d.name()
-    if len(name) == 1 or name[1] == '^':
-      elements.append(name)
-      lone_pairs.append(m[d].as_long())
-
-  # Add bond pair counts
-  for d in m.decls():
-    name = d.name()
-    # Bond Pairs
-    if len(name) > 1 and name[1] != '^':
-      bonds.append((elements.index(name[0]), elements.index(name[1:4]), m[d].as_long()))
-  
-  draw_lewis_structure(elements, bonds, lone_pairs)
-
-
-# WRITTEN BY GEMINI
-def draw_lewis_structure(elements, bonds, lone_pairs):
-    fig, ax = plt.subplots(figsize=(3, 3))
-    ax.set_aspect('equal')
-    ax.axis('off')
-
-    # 1. Coordinate Setup (Circle Layout)
-    n = len(elements)
-    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
-    pos = {i: np.array([np.cos(a), np.sin(a)]) / 3 for i, a in enumerate(angles)}
-
-    # 2. Draw Bonds with Multi-bond Offsets
-    for idx1, idx2, count in bonds:
-        p1, p2 = pos[idx1], pos[idx2]
-        vec = p2 - p1
-        perp = np.array([-vec[1], vec[0]])
-        perp = perp / np.linalg.norm(perp) * 0.05
-
-        # Offset multi-bonds slightly so they don't overlap
-        offsets = np.linspace(-0.6, 0.6, count) if count > 1 else [0]
-        for opt in offsets:
-            shift = perp * opt
-            ax.plot([p1[0] + shift[0], p2[0] + shift[0]], 
-                    [p1[1] + shift[1], p2[1] + shift[1]], 
-                    color='black', lw=2, zorder=1)
-
-    # 3. Draw Atoms and Distributed Lone Pairs
-    for i, (el, lp_count) in enumerate(zip(elements, lone_pairs)):
-        x, y = pos[i]
-        ax.text(x, y, el[0], fontsize=28, fontweight='bold', ha='center', va='center', 
-                bbox=dict(facecolor='white', edgecolor='none', pad=1.5), zorder=2)
-
-        # Calculate angles to neighbors to find "open" slots
-        neighbor_angles = []
-        for b1, b2, _ in bonds:
-            if b1 == i: neighbor_angles.append(np.arctan2(pos[b2][1]-y, pos[b2][0]-x))
-            if b2 == i: neighbor_angles.append(np.arctan2(pos[b1][1]-y, pos[b1][0]-x))
-
-        # Standard slots: 0, 90, 180, 270 degrees
-        potential_slots = [0, np.pi/2, np.pi, 3*np.pi/2]
-        available_slots = []
-        
-        for slot in potential_slots:
-            # Only use slot if it's not pointing toward a bond
-            if not any(abs((slot - na + np.pi) % (2*np.pi) - np.pi) < 0.5 for na in neighbor_angles):
-                available_slots.append(slot)
-
-        # Draw lone pairs in the best available slots
-        for lp_idx in range(min(lp_count, len(available_slots))):
-            slot_angle = available_slots[lp_idx]
-            dist = 0.1
-            # The two dots of the pair are slightly separated perpendicular to the slot angle
-            dot_gap = 0.03
-            for side in [-1, 1]:
-                dx = x + dist * np.cos(slot_angle) + side * dot_gap * np.sin(slot_angle)
-                dy = y + dist * np.sin(slot_angle) - side * dot_gap * np.cos(slot_angle)
-                ax.scatter(dx, dy, s=40, color='red', zorder=3) # Red for visibility
-
-    plt.show()'''
+''' + LAYOUT + '''
+
+class LewisMolecule:
+    """Records which variable holds each atom's lone pairs and each bond's order"""
+    def __init__(self):
+        self.elements = []
+        self.lone_pairs = []
+        self.bonds = []
+
+    def atom(self, element, lone_pairs):
+        """Adds an atom and returns its index, e.g. c = molecule.atom('C', C)"""
+        self.elements.append(element)
+        self.lone_pairs.append(lone_pairs)
+        return len(self.elements) - 1
+
+    def bond(self, i, j, order):
+        self.bonds.append((i, j, order))
+
+
+def molecule_from_names(m):
+    """Builds a LewisMolecule from variable names such as 'O^1' (lone pairs) and 'CO^1' (a bond)"""
+    import re
+    atom_name = r'[A-Z][a-z]?(?:\\^\\d+)?'
+    molecule = LewisMolecule()
+    index = {}
+    bonds = []
+    for d in m.decls():
+        name = d.name()
+        if re.fullmatch(atom_name, name):
+            index[name] = molecule.atom(re.match(r'[A-Z][a-z]?', name).group(), d())
+        else:
+            bonds.append((name, d()))
+
+    def lookup(atom, bond):
+        # CO^1 bonds C to O^1, or to O when there is only one O
+        for key in (atom, atom.split('^')[0]):
+            if key in index:
+                return index[key]
+        raise KeyError(f'bond {bond!r} names an unknown atom {atom!r}')
+
+    for name, order in bonds:
+        match = re.fullmatch(f'({atom_name})({atom_name})', name)
+        if match is None:
+            raise ValueError(f'{name!r} is neither an atom nor a bond between two atoms')
+        first, second = match.groups()
+        molecule.bond(lookup(first, name), lookup(second, name), order)
+    return molecule
+
+
+def draw_lewis_from_model(m, molecule=None):
+    """Converts a model to the format required by draw_lewis_structure"""
+    if molecule is None:
+        molecule = molecule_from_names(m)
+
+    lone_pairs = [m.eval(v, model_completion=True).as_long() for v in molecule.lone_pairs]
+    bonds = [(i, j, m.eval(v, model_completion=True).as_long()) for i, j, v in molecule.bonds]
+    draw_lewis_structure(molecule.elements, bonds, lone_pairs)
+'''
 
 NI3 = '''## Lewis Structure of Nitrogen Triiodide
 
@@ -220,8 +207,13 @@ MODEL = '''print( s.model() ) # output solution'''
 
 VIEW_2 = '''When you think your solution is correct, use the cell below to visualize it.'''
 
-VIEW_CODE = '''m = opt.model()
-draw_lewis_from_model(m)'''
+VIEW_CODE = '''molecule = LewisMolecule()
+n = molecule.atom('N', N)
+for lone, order in [(I1, N_I1), (I2, N_I2), (I3, N_I3)]:
+    molecule.bond(n, molecule.atom('I', lone), order)
+
+m = s.model()
+draw_lewis_from_model(m, molecule)'''
 
 ### Build the notebook ###
 mynotebook = nbf.v4.new_notebook()
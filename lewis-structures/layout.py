@@ -0,0 +1,303 @@
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+BOND_LENGTH = 1.0
+# Lone pairs are drawn in up to this many slots around an atom
+MAX_LONE_PAIRS = 6
+# Inches per bond length in drawings
+UNIT_INCHES = 0.9
+
+# (steric number, bonded atoms): the angles between consecutive bonds going around an atom, in
+# degrees, for a 2D drawing of each VSEPR shape (e.g. bent water, T-shaped ClF3, seesaw SF4).
+# Other combinations spread the bonds evenly.
+BOND_GAPS = {
+    (3, 2): (120, 240),
+    (4, 2): (109.5, 250.5), (4, 3): (109.5, 109.5, 141), (4, 4): (90, 90, 90, 90),
+    (5, 3): (90, 90, 180), (5, 4): (60, 180, 60, 60), (5, 5): (90, 60, 60, 60, 90),
+    (6, 3): (90, 90, 180), (6, 4): (90, 90, 90, 90),
+}
+
+Layout = namedtuple("Layout", ["positions", "bonds", "slots"])
+Layout.__doc__ = """
+The 2D drawing of a molecular graph: an (atoms, 2) array of positions, the bonds as (i, j) pairs,
+and an (atoms, MAX_LONE_PAIRS, MAX_LONE_PAIRS) array of lone-pair directions in radians, where
+atom i with k lone pairs uses slots[i, k - 1, :k]. A layout only depends on the connectivity, so it
+is shared by every structure of the molecule.
+"""
+
+
+def steric_numbers(num_atoms, bonds, lone_pairs=None):
+    """Returns the bonded atoms plus lone pairs of each atom"""
+    degree = np.bincount(np.asarray(bonds, dtype=int).ravel(), minlength=num_atoms)
+    return degree if lone_pairs is None else degree + np.asarray(lone_pairs, dtype=int)
+
+
+### Relaxation ###
+
+def _initial_positions(num_atoms, bonds):
+    # Spectral layout: the two smoothest non-constant eigenvectors of the graph Laplacian, which
+    # already draws rings as polygons and chains as arcs
+    if num_atoms == 1:
+        return np.zeros((1, 2))
+    laplacian = np.zeros((num_atoms, num_atoms))
+    for i, j in bonds:
+        laplacian[i, j] -= 1
+        laplacian[j, i] -= 1
+        laplacian[i, i] += 1
+        laplacian[j, j] += 1
+    _, vectors = np.linalg.eigh(laplacian)
+    positions = vectors[:, 1:3] if num_atoms > 2 else np.column_stack([vectors[:, 1], np.zeros(num_atoms)])
+    # A fixed jitter breaks symmetric ties, so the same graph always gets the same drawing
+    positions = positions + np.random.default_rng(0).normal(scale=1e-3, size=positions.shape)
+    if len(bonds):
+        ends = np.asarray(bonds)
+        positions *= BOND_LENGTH / np.linalg.norm(positions[ends[:, 0]] - positions[ends[:, 1]], axis=1).mean()
+    return positions
+
+
+def _angle_groups(num_atoms, bonds, steric):
+    """Groups the atoms with two or more bonds by shape: (centers, neighbors, gaps in radians)"""
+    neighbors = [[] for _ in range(num_atoms)]
+    for i, j in bonds:
+        neighbors[i].append(j)
+        neighbors[j].append(i)
+    groups = {}
+    for center, adjacent in enumerate(neighbors):
+        d = len(adjacent)
+        if d >= 2:
+            gaps = BOND_GAPS.get((int(steric[center]), d), (360 / d,) * d)
+            groups.setdefault(gaps, []).append((center, adjacent))
+    return [(np.array([c for c, _ in members]), np.array([a for _, a in members]), np.radians(gaps))
+            for gaps, members in groups.items()]
+
+
+def _relax(positions, bonds, groups, steps=400):
+    """
+    Force-directed relaxation: bonds are springs of BOND_LENGTH, the bonds around each atom are
+    turned toward the gaps of its VSEPR shape, and atoms that are not bonded repel each other.
+    Every force is computed for all atoms at once.
+    """
+    n = len(positions)
+    ends = np.asarray(bonds, dtype=int).reshape(-1, 2)
+    repel = ~np.eye(n, dtype=bool)
+    repel[ends[:, 0], ends[:, 1]] = repel[ends[:, 1], ends[:, 0]] = False
+    # The template rotations of each shape, tried against the current order of the bonds
+    rotations = [np.stack([np.roll(gaps, -k) for k in range(len(gaps))]) for _, _, gaps in groups]
+
+    for step in range(steps):
+        force = np.zeros_like(positions)
+
+        delta = positions[ends[:, 1]] - positions[ends[:, 0]]
+        length = np.linalg.norm(delta, axis=1, keepdims=True) + 1e-9
+        pull = (length - BOND_LENGTH) * delta / length
+        np.add.at(force, ends[:, 0], pull)
+        np.add.at(force, ends[:, 1], -pull)
+
+        for (centers, neighbors, _), shifts in zip(groups, rotations):
+            vectors = positions[neighbors] - positions[centers][:, None, :]
+            angles = np.arctan2(vectors[..., 1], vectors[..., 0])
+            order = np.argsort(angles, axis=1)
+            neighbors = np.take_along_axis(neighbors, order, axis=1)
+            vectors = np.take_along_axis(vectors, order[..., None], axis=1)
+            angles = np.take_along_axis(angles, order, axis=1)
+            current = (np.roll(angles, -1, axis=1) - angles) % (2 * math.pi)
+            target = shifts[np.argmin(((current[:, None, :] - shifts[None]) ** 2).sum(axis=2), axis=1)]
+            # A gap that is too wide pushes its first bond forward and its second back
+            error = current - target
+            turn = error - np.roll(error, 1, axis=1)
+            tangents = np.stack([-vectors[..., 1], vectors[..., 0]], axis=2)
+            tangents /= np.linalg.norm(tangents, axis=2, keepdims=True) + 1e-9
+            push = 0.5 * turn[..., None] * tangents
+            np.add.at(force, neighbors.ravel(), push.reshape(-1, 2))
+            np.add.at(force, centers, -push.sum(axis=1))
+
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.linalg.norm(delta, axis=2) + 1e-9
+        force += np.where(repel[..., None], 0.05 * delta / distance[..., None] ** 3, 0).sum(axis=1)
+
+        # Cooling step, capped so that a close pair cannot throw the drawing apart
+        move = force * 0.2 * (1 - step / steps)
+        norms = np.linalg.norm(move, axis=1, keepdims=True)
+        positions = positions + move * np.minimum(1, 0.2 / (norms + 1e-9))
+        if norms.max() < 1e-4 * BOND_LENGTH:
+            break
+    return positions
+
+
+def _lone_pair_slots(positions, bonds):
+    """
+    Returns the lone-pair directions of every atom for each number of lone pairs: slots[i, k - 1, :k]
+    for k pairs. The pairs are shared out among the gaps between an atom's bonds, one at a time to
+    the gap that leaves the most room per pair, and spaced evenly inside each gap; every step runs
+    for all atoms at once.
+    """
+    n = len(positions)
+    ends = np.asarray(bonds, dtype=int).reshape(-1, 2)
+    atoms = np.concatenate([ends[:, 0], ends[:, 1]])
+    others = np.concatenate([ends[:, 1], ends[:, 0]])
+    directions = positions[others] - positions[atoms]
+    angles = np.arctan2(directions[:, 1], directions[:, 0])
+
+    # The bond directions of each atom in one row, sorted
+    order = np.lexsort([angles, atoms])
+    atoms, angles = atoms[order], angles[order]
+    degree = np.bincount(atoms, minlength=n)
+    column = np.arange(len(atoms)) - np.repeat(np.cumsum(degree) - degree, degree)
+    width = max(int(degree.max()) if len(atoms) else 0, 1)
+    starts = np.zeros((n, width))
+    starts[atoms, column] = angles
+
+    # Gap c runs from bond c to the next one around the atom; an atom without bonds has one full turn
+    rows = np.arange(n)
+    columns = np.arange(width)[None, :]
+    following = np.where(columns + 1 < degree[:, None], np.roll(starts, -1, axis=1), starts[:, :1] + 2 * math.pi)
+    gaps = np.where(columns < np.maximum(degree, 1)[:, None], following - starts, 0)
+
+    slots = np.zeros((n, MAX_LONE_PAIRS, MAX_LONE_PAIRS))
+    counts = np.zeros((n, width), dtype=int)
+    for k in range(1, MAX_LONE_PAIRS + 1):
+        counts[rows, np.argmax(gaps / (counts + 1), axis=1)] += 1
+        gap = np.repeat(np.tile(np.arange(width), n), counts.ravel()).reshape(n, k)
+        used = np.take_along_axis(counts, gap, axis=1)
+        rank = np.arange(k)[None, :] - np.take_along_axis(np.cumsum(counts, axis=1) - counts, gap, axis=1)
+        # Inside a gap between bonds the pairs stay clear of both ends, around a bare atom they go all the way
+        spacing = np.where(degree[:, None] > 0, (rank + 1) / (used + 1), rank / used)
+        slots[:, k - 1, :k] = np.take_along_axis(starts, gap, axis=1) + np.take_along_axis(gaps, gap, axis=1) * spacing
+    return slots
+
+
+@lru_cache(maxsize=256)
+def _cached_layout(num_atoms, bonds, steric):
+    positions = _initial_positions(num_atoms, bonds)
+    positions = _relax(positions, bonds, _angle_groups(num_atoms, bonds, steric))
+
+    # Centered, with the longest extent horizontal
+    positions -= positions.mean(axis=0)
+    if num_atoms > 1:
+        _, _, axes = np.linalg.svd(positions, full_matrices=False)
+        positions = positions @ axes.T
+    slots = _lone_pair_slots(positions, bonds)
+    positions.setflags(write=False)
+    slots.setflags(write=False)
+    return Layout(positions, list(bonds), slots)
+
+
+def vsepr_layout(elements, bonds, lone_pairs=None):
+    """
+    Returns the Layout of a molecule with bonds as (i, j) pairs or (i, j, order) triples. With
+    lone_pairs, bond angles follow the VSEPR shape of each steric number, otherwise only the bonded
+    atoms count. Layouts are cached by connectivity and the shapes of the atoms with two or more
+    bonds, so the structures of one molecule usually share a single layout.
+    """
+    pairs = tuple((int(bond[0]), int(bond[1])) for bond in bonds)
+    steric = steric_numbers(len(elements), pairs, lone_pairs)
+    degree = steric_numbers(len(elements), pairs)
+    # Atoms with a single bond have no angles, so their lone pairs do not change the layout
+    key = tuple(int(s) if d >= 2 else 0 for s, d in zip(steric, degree))
+    return _cached_layout(len(elements), pairs, key)
+
+
+### Drawing ###
+
+def _bond_segments(layout, bond_orders):
+    """Returns one line segment per shared pair, multiple bonds offset side by side"""
+    orders = np.asarray(bond_orders, dtype=int)
+    ends = np.asarray(layout.bonds, dtype=int).reshape(-1, 2)
+    start, end = layout.positions[ends[:, 0]], layout.positions[ends[:, 1]]
+    along = end - start
+    along /= np.linalg.norm(along, axis=1, keepdims=True) + 1e-9
+    across = np.stack([-along[:, 1], along[:, 0]], axis=1)
+
+    bond = np.repeat(np.arange(len(orders)), orders)
+    rank = np.arange(len(bond)) - np.repeat(np.cumsum(orders) - orders, orders)
+    offset = (rank - (orders[bond] - 1) / 2)[:, None] * 0.12 * across[bond]
+    # Stop short of the atom symbols
+    trim = 0.28 * along[bond]
+    return np.stack([start[bond] + trim + offset, end[bond] - trim + offset], axis=1)
+
+
+def _electron_dots(layout, lone_pairs):
+    """Returns the (x, y) points of every lone-pair electron, two per used slot"""
+    counts = np.minimum(np.asarray(lone_pairs, dtype=int), MAX_LONE_PAIRS)
+    used = np.arange(MAX_LONE_PAIRS)[None, :] < counts[:, None]
+    atoms = np.nonzero(used)[0]
+    angles = layout.slots[np.arange(len(counts)), counts - 1][used]
+    outward = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    across = np.stack([-outward[:, 1], outward[:, 0]], axis=1)
+    centers = layout.positions[atoms] + 0.38 * outward
+    return np.concatenate([centers + 0.07 * across, centers - 0.07 * across])
+
+
+class LewisDrawing:
+    """
+    Draws the atoms of a layout on ax once; update then redraws only the bonds and lone pairs, so
+    every structure of a molecule (e.g. its resonance structures) can reuse the same drawing.
+    """
+
+    def __init__(self, layout, elements, ax):
+        self.layout = layout
+        self.ax = ax
+        self.artists = []
+        for (x, y), element in zip(layout.positions, elements):
+            ax.text(x, y, element, fontsize=0.3 * UNIT_INCHES * 72, fontweight="bold",
+                    ha="center", va="center", zorder=2)
+        low, high = layout.positions.min(axis=0) - 0.75, layout.positions.max(axis=0) + 0.75
+        ax.set_xlim(low[0], high[0])
+        ax.set_ylim(low[1], high[1])
+        ax.set_aspect("equal")
+        ax.axis("off")
+
+    def update(self, bond_orders, lone_pairs):
+        for artist in self.artists:
+            artist.remove()
+        dots = _electron_dots(self.layout, lone_pairs)
+        self.artists = [
+            self.ax.add_collection(LineCollection(_bond_segments(self.layout, bond_orders),
+                                                  colors="black", linewidths=2, zorder=1)),
+            self.ax.scatter(dots[:, 0], dots[:, 1], s=40, color="red", zorder=3),
+        ]
+        return self
+
+
+def _figure_size(layout, rows=1, columns=1):
+    extent = np.ptp(layout.positions, axis=0) + 1.5
+    return max(2.5, columns * extent[0] * UNIT_INCHES), max(2.5, rows * extent[1] * UNIT_INCHES)
+
+
+def draw_lewis_structure(elements, bonds, lone_pairs, ax=None):
+    """
+    Draws a Lewis structure, bonds given as (i, j, order) triples, with VSEPR bond angles.
+    Without ax, a figure of its own is created and shown.
+    """
+    layout = vsepr_layout(elements, bonds, lone_pairs)
+    show = ax is None
+    if show:
+        _, ax = plt.subplots(figsize=_figure_size(layout))
+    drawing = LewisDrawing(layout, elements, ax).update([order for _, _, order in bonds], lone_pairs)
+    if show:
+        plt.show()
+    return drawing
+
+
+def draw_structures(structures, columns=None):
+    """
+    Draws Lewis structures of one molecule side by side (e.g. Resonance.structures, or the answers
+    of a class), from records with molecule.elements, molecule.bonds, lone_pairs and bond_orders.
+    The layout is computed once, from the first structure, and each panel only draws electrons.
+    Returns the figure.
+    """
+    molecule = structures[0].molecule
+    layout = vsepr_layout(molecule.elements, molecule.bonds, structures[0].lone_pairs)
+    columns = columns or len(structures)
+    rows = math.ceil(len(structures) / columns)
+    fig, axes = plt.subplots(rows, columns, figsize=_figure_size(layout, rows, columns), squeeze=False)
+    for ax in axes.ravel()[len(structures):]:
+        ax.axis("off")
+    for ax, structure in zip(axes.ravel(), structures):
+        LewisDrawing(layout, molecule.elements, ax).update(structure.bond_orders, structure.lone_pairs)
+    return fig
@@ -0,0 +1,189 @@
+import os
+import sys
+from collections import namedtuple
+
+from z3 import Int, Solver, Sum, sat
+
+# The formula parser lives with the advanced reaction balancing notebook
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reaction-balancing-advanced"))
+from stoichiometry import CHARGE, parse_formula
+
+# symbol: (valence electrons, period, Pauling electronegativity), for the main-group elements
+PERIODIC_TABLE = {
+    "H": (1, 1, 2.20), "He": (2, 1, 0.0),
+    "Li": (1, 2, 0.98), "Be": (2, 2, 1.57), "B": (3, 2, 2.04), "C": (4, 2, 2.55),
+    "N": (5, 2, 3.04), "O": (6, 2, 3.44), "F": (7, 2, 3.98), "Ne": (8, 2, 0.0),
+    "Na": (1, 3, 0.93), "Mg": (2, 3, 1.31), "Al": (3, 3, 1.61), "Si": (4, 3, 1.90),
+    "P": (5, 3, 2.19), "S": (6, 3, 2.58), "Cl": (7, 3, 3.16), "Ar": (8, 3, 0.0),
+    "K": (1, 4, 0.82), "Ca": (2, 4, 1.00), "Ga": (3, 4, 1.81), "Ge": (4, 4, 2.01),
+    "As": (5, 4, 2.18), "Se": (6, 4, 2.55), "Br": (7, 4, 2.96), "Kr": (8, 4, 3.00),
+    "Rb": (1, 5, 0.82), "Sr": (2, 5, 0.95), "In": (3, 5, 1.78), "Sn": (4, 5, 1.96),
+    "Sb": (5, 5, 2.05), "Te": (6, 5, 2.10), "I": (7, 5, 2.66), "Xe": (8, 5, 2.60),
+}
+
+MAX_BOND_ORDER = 3
+
+Molecule = namedtuple("Molecule", ["elements", "labels", "bonds", "charge"])
+Molecule.__doc__ = """
+The atoms of a molecule, in formula order, with labels such as 'O1' and 'O2' for repeated elements,
+the bonds as (i, j) atom indices, and the overall charge.
+"""
+
+Lewis = namedtuple("Lewis", ["molecule", "lone_pairs", "bond_orders"])
+Lewis.__doc__ = """
+A Lewis structure: the number of lone pairs on each atom and the order of each bond, in the order
+of molecule.elements and molecule.bonds.
+"""
+
+
+def valence(element):
+    if element not in PERIODIC_TABLE:
+        raise ValueError(f"no valence data for {element!r}")
+    return PERIODIC_TABLE[element][0]
+
+
+def electron_pairs(element, expanded_octets=True):
+    """
+    Returns the (fewest, most) electron pairs, lone or bonding, around an atom of element: a duet
+    for H and He, an octet that may be incomplete for elements with fewer than four valence
+    electrons (e.g. B in BF3), and up to six pairs from period 3 on when octets may expand.
+    """
+    electrons, period, _ = PERIODIC_TABLE[element]
+    if period == 1:
+        return 1, 1
+    if electrons < 4:
+        return electrons, 4
+    if period >= 3 and expanded_octets:
+        return 4, 6
+    return 4, 4
+
+
+def atom_labels(elements):
+    counts = {}
+    for element in elements:
+        counts[element] = counts.get(element, 0) + 1
+    seen = {}
+    labels = []
+    for element in elements:
+        seen[element] = seen.get(element, 0) + 1
+        labels.append(f"{element}{seen[element]}" if counts[element] > 1 else element)
+    return labels
+
+
+def infer_skeleton(elements):
+    """
+    Returns bonds for a central-atom skeleton: the central atom is an element that occurs once if
+    possible (N in NI3), then not F, then the least electronegative (C in HCN). It is bonded to every
+    other heavy atom, and each hydrogen goes to an outer oxygen (as in oxyacids) while one is free,
+    otherwise to the central atom.
+    """
+    heavy = [i for i, e in enumerate(elements) if e != "H"]
+    hydrogens = [i for i, e in enumerate(elements) if e == "H"]
+    if not heavy:
+        # H2
+        return [(hydrogens[0], hydrogens[1])] if len(hydrogens) == 2 else []
+
+    center = min(heavy, key=lambda i: (elements.count(elements[i]) > 1, elements[i] == "F",
+                                       PERIODIC_TABLE[elements[i]][2], i))
+    bonds = [(center, i) for i in heavy if i != center]
+    free_oxygens = [i for i in heavy if i != center and elements[i] == "O"]
+    for h in hydrogens:
+        bonds.append((free_oxygens.pop(0), h) if free_oxygens else (center, h))
+    return bonds
+
+
+def parse_molecule(formula, connectivity=None):
+    """
+    Builds a Molecule from a formula such as 'CO2', 'NO3^-' or 'C6H6'. connectivity lists the bonds
+    as pairs of atom labels or indices; without it, a central-atom skeleton is inferred.
+    """
+    counts = parse_formula(formula)
+    charge = counts.pop(CHARGE, 0)
+    elements = [element for element, count in counts.items() for _ in range(count)]
+    for element in elements:
+        valence(element)
+    labels = atom_labels(elements)
+
+    if connectivity is None:
+        bonds = infer_skeleton(elements)
+    else:
+        index = {label: i for i, label in enumerate(labels)}
+        bonds = []
+        for a, b in connectivity:
+            i, j = (index[a] if isinstance(a, str) else a), (index[b] if isinstance(b, str) else b)
+            if i == j:
+                raise ValueError(f"atom {labels[i]} cannot bond to itself")
+            bonds.append((i, j))
+    return Molecule(elements, labels, bonds, charge)
+
+
+def lewis_constraints(molecule, expanded_octets=True):
+    """
+    Returns (constraints, lone_pairs, bond_orders) for a molecule, with one Int per atom for its lone
+    pairs and one per bond for its order:
+    1) every valence electron is placed, two per lone pair or bond order
+    2) each atom has a duet, an octet or an expanded octet of pairs (see electron_pairs)
+    3) each bond is a single, double or triple bond
+    Each sum is a single flat Sum over the atoms or the bonds.
+    """
+    elements, labels, bonds, charge = molecule
+    total = sum(valence(e) for e in elements) - charge
+    if total % 2:
+        raise ValueError(f"{total} valence electrons cannot all be paired")
+
+    lone_pairs = [Int(label) for label in labels]
+    bond_orders = [Int(f"{labels[i]}-{labels[j]}") for i, j in bonds]
+
+    # The bonds of each atom, so every atom's pair count is built in one pass over the bonds
+    incident = [[] for _ in elements]
+    for order, (i, j) in zip(bond_orders, bonds):
+        incident[i].append(order)
+        incident[j].append(order)
+
+    constraints = [2 * Sum(lone_pairs + bond_orders) == total]
+    for element, lone, orders in zip(elements, lone_pairs, incident):
+        fewest, most = electron_pairs(element, expanded_octets)
+        pairs = Sum([lone] + orders)
+        constraints += [lone >= 0, pairs >= fewest, pairs <= most]
+    for order in bond_orders:
+        constraints += [order >= 1, order <= MAX_BOND_ORDER]
+    return constraints, lone_pairs, bond_orders
+
+
+class LewisModel:
+    """
+    The Z3 model of a molecule's Lewis structure. lone_pairs[i] is the variable for atom i and
+    bond_orders[k] the one for molecule.bonds[k], recorded as the constraints are built, so a
+    solution is decoded in one pass over the variables without reading their names.
+    """
+
+    def __init__(self, molecule, expanded_octets=True):
+        self.molecule = molecule
+        self.constraints, self.lone_pairs, self.bond_orders = lewis_constraints(molecule, expanded_octets)
+
+    def solver(self):
+        s = Solver()
+        s.add(self.constraints)
+        return s
+
+    def decode(self, m):
+        """Returns the Lewis structure of a model of the constraints"""
+        return Lewis(self.molecule,
+                     [m.eval(v, model_completion=True).as_long() for v in self.lone_pairs],
+                     [m.eval(v, model_completion=True).as_long() for v in self.bond_orders])
+
+
+def lewis_solver(molecule, expanded_octets=True):
+    """Returns (s, lone_pairs, bond_orders), a Solver holding the molecule's Lewis constraints"""
+    model = LewisModel(molecule, expanded_octets)
+    return model.solver(), model.lone_pairs, model.bond_orders
+
+
+def lewis_structure(formula, connectivity=None, expanded_octets=True):
+    """Returns a Lewis structure for the formula, or raises ValueError if none satisfies the rules"""
+    molecule = formula if isinstance(formula, Molecule) else parse_molecule(formula, connectivity)
+    model = LewisModel(molecule, expanded_octets)
+    s = model.solver()
+    if s.check() != sat:
+        raise ValueError(f"no Lewis structure for {formula} satisfies the octet rules")
+    return model.decode(s.model())
@@ -0,0 +1,213 @@
+from collections import namedtuple
+
+from z3 import Int, Optimize, Or, Sum, sat
+
+from lewis import LewisModel, Molecule, parse_molecule, valence
+
+Resonance = namedtuple("Resonance", ["formal_charge", "structures", "equivalent"])
+Resonance.__doc__ = """
+The resonance structures with the least total absolute formal charge: the optimum, one Lewis
+structure per symmetry class, and for each the number of equivalent structures in its class
+(e.g. benzene has one class of two Kekule structures).
+"""
+
+
+### Formal charge ###
+
+def formal_charges(lewis):
+    """Returns the formal charge of each atom: valence - lone electrons - bonds"""
+    molecule = lewis.molecule
+    charges = [valence(e) - 2 * lone for e, lone in zip(molecule.elements, lewis.lone_pairs)]
+    for (i, j), order in zip(molecule.bonds, lewis.bond_orders):
+        charges[i] -= order
+        charges[j] -= order
+    return charges
+
+
+def formal_charge_model(molecule, expanded_octets=True):
+    """
+    Returns (model, total): the molecule's LewisModel, with constraints added so that total is the
+    sum of the absolute formal charges, each absolute value bounded from both sides by its own Int.
+    """
+    model = LewisModel(molecule, expanded_octets)
+    incident = [[] for _ in molecule.elements]
+    for order, (i, j) in zip(model.bond_orders, molecule.bonds):
+        incident[i].append(order)
+        incident[j].append(order)
+
+    magnitudes = []
+    for element, label, lone, orders in zip(molecule.elements, molecule.labels, model.lone_pairs, incident):
+        charge = valence(element) - 2 * lone - Sum(orders)
+        magnitude = Int(f"|FC_{label}|")
+        model.constraints += [magnitude >= charge, magnitude >= -charge]
+        magnitudes.append(magnitude)
+    return model, Sum(magnitudes)
+
+
+def minimize_formal_charge(molecule, expanded_octets=True):
+    """Returns (Lewis structure, total absolute formal charge) from a single Optimize call"""
+    if not isinstance(molecule, Molecule):
+        molecule = parse_molecule(molecule)
+    model, total = formal_charge_model(molecule, expanded_octets)
+    opt = Optimize()
+    opt.add(model.constraints)
+    opt.minimize(total)
+    if opt.check() != sat:
+        raise ValueError(f"no Lewis structure for {''.join(molecule.labels)} satisfies the octet rules")
+    m = opt.model()
+    return model.decode(m), m.eval(total).as_long()
+
+
+### Symmetry ###
+# Automorphisms of the molecular graph, atoms colored by element, found by backtracking. Only
+# generators are kept: for each atom of a base, one automorphism per atom it can be mapped to
+# while the earlier base atoms stay fixed, which together generate the whole group.
+
+def _refine(molecule, neighbors):
+    # Colors atoms by element, then by the colors of their neighbors, until no class splits
+    colors = [molecule.elements.index(e) for e in molecule.elements]
+    while True:
+        signatures = [(colors[v], tuple(sorted(colors[w] for w in neighbors[v]))) for v in range(len(colors))]
+        numbering = {s: k for k, s in enumerate(sorted(set(signatures)))}
+        refined = [numbering[s] for s in signatures]
+        if len(set(refined)) == len(set(colors)):
+            return refined
+        colors = refined
+
+
+def _extend(mapping, order, colors, neighbors):
+    """Completes a partial atom mapping into an automorphism, or returns None"""
+    used = set(mapping.values())
+    position = next((k for k, v in enumerate(order) if v not in mapping), None)
+    if position is None:
+        return dict(mapping)
+    v = order[position]
+    for u in range(len(colors)):
+        if u in used or colors[u] != colors[v]:
+            continue
+        if all((w in neighbors[v]) == (mapping[w] in neighbors[u]) for w in mapping):
+            mapping[v] = u
+            found = _extend(mapping, order, colors, neighbors)
+            del mapping[v]
+            if found is not None:
+                return found
+    return None
+
+
+def automorphism_generators(molecule):
+    """Returns permutations of the atoms, as tuples, that generate the molecule's symmetry group"""
+    n = len(molecule.elements)
+    neighbors = [set() for _ in range(n)]
+    for i, j in molecule.bonds:
+        neighbors[i].add(j)
+        neighbors[j].add(i)
+    colors = _refine(molecule, neighbors)
+
+    # Visit atoms breadth first, so each new atom has mapped neighbors constraining it
+    order = []
+    for start in range(n):
+        if start in order:
+            continue
+        queue = [start]
+        order.append(start)
+        while queue:
+            v = queue.pop(0)
+            for w in sorted(neighbors[v]):
+                if w not in order:
+                    order.append(w)
+                    queue.append(w)
+
+    generators = []
+    for depth, base in enumerate(order):
+        fixed = {v: v for v in order[:depth]}
+        # The orbit of base under the generators that fix the earlier base atoms
+        level = [g for g in generators if all(g[v] == v for v in fixed)]
+        orbit = {base}
+        frontier = [base]
+        while frontier:
+            v = frontier.pop()
+            for g in level:
+                if g[v] not in orbit:
+                    orbit.add(g[v])
+                    frontier.append(g[v])
+        for u in range(n):
+            if u in orbit or u in fixed or colors[u] != colors[base]:
+                continue
+            # base -> u must agree with the fixed atoms before the rest is searched
+            if any((w in neighbors[base]) != (w in neighbors[u]) for w in fixed):
+                continue
+            mapping = _extend({**fixed, base: u}, order, colors, neighbors)
+            if mapping is not None:
+                g = tuple(mapping[v] for v in range(n))
+                generators.append(g)
+                level.append(g)
+                # Close the orbit under the new generator
+                frontier = list(orbit)
+                while frontier:
+                    v = frontier.pop()
+                    for h in level:
+                        if h[v] not in orbit:
+                            orbit.add(h[v])
+                            frontier.append(h[v])
+    return generators
+
+
+def _bond_permutations(molecule, generators):
+    # Each atom permutation as a permutation of the bonds
+    index = {}
+    for k, (i, j) in enumerate(molecule.bonds):
+        index[i, j] = index[j, i] = k
+    return [tuple(index[g[i], g[j]] for i, j in molecule.bonds) for g in generators]
+
+
+def _images(lewis, generators, bond_generators):
+    """Returns every symmetry image of a structure, as (lone pairs, bond orders) tuples"""
+    start = (tuple(lewis.lone_pairs), tuple(lewis.bond_orders))
+    images = {start}
+    frontier = [start]
+    while frontier:
+        lone, orders = frontier.pop()
+        for g, h in zip(generators, bond_generators):
+            image_lone = [0] * len(lone)
+            for v, count in enumerate(lone):
+                image_lone[g[v]] = count
+            image_orders = [0] * len(orders)
+            for k, order in enumerate(orders):
+                image_orders[h[k]] = order
+            image = (tuple(image_lone), tuple(image_orders))
+            if image not in images:
+                images.add(image)
+                frontier.append(image)
+    return images
+
+
+### Resonance ###
+
+def resonance_structures(molecule, connectivity=None, expanded_octets=True, limit=None):
+    """
+    Finds the least total absolute formal charge with one Optimize call, then every resonance
+    structure at that optimum. Structures are enumerated on a plain Solver with the optimum fixed,
+    blocking each bond-order assignment found together with all of its symmetry images, so each
+    symmetry class costs one check. Returns a Resonance; limit caps the number of classes.
+    """
+    if not isinstance(molecule, Molecule):
+        molecule = parse_molecule(molecule, connectivity)
+    best, optimum = minimize_formal_charge(molecule, expanded_octets)
+
+    model, total = formal_charge_model(molecule, expanded_octets)
+    s = model.solver()
+    s.add(total == optimum)
+
+    generators = automorphism_generators(molecule)
+    bond_generators = _bond_permutations(molecule, generators)
+
+    structures, equivalent = [], []
+    lewis = best
+    while lewis is not None and (limit is None or len(structures) < limit):
+        images = _images(lewis, generators, bond_generators)
+        structures.append(lewis)
+        equivalent.append(len({orders for _, orders in images}))
+        for orders in {orders for _, orders in images}:
+            s.add(Or([v != order for v, order in zip(model.bond_orders, orders)]))
+        lewis = model.decode(s.model()) if s.check() == sat else None
+    return Resonance(optimum, structures, equivalent)
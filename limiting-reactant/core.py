@@ -1,4 +1,9 @@
 import nbformat as nbf
+import os
+
+# The report helpers are kept in report.py and copied into the notebook, which cannot import it
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "report.py")) as f:
+    REPORT = f.read()
 
 IMPORTS = '''!pip install z3-solver
 !pip install git+https://github.com/crrivero/FormalMethodsTasting.git#subdirectory=core
@@ -94,19 +99,32 @@ MODEL = '''To better visualize the results, we have created a function to print
 
 You should see that the limiting reactant was O2, as all 8 mols were consumed.'''
 
-MODEL_CODE = '''
-m = opt.model()
-
-# THIS SHOULD BE IMPORTED
-extent = float(m[extent].as_decimal(5))
-print(f"Reaction Extent: {extent}")
-print(f"CO2 Produced: {m[produced_CO2].as_decimal(2)} mol")
-print(f"H2O Produced: {m[produced_H2O].as_decimal(2)} mol")
-print(f"Consumed C3H8: {m[consumed_C3H8].as_decimal(2)} mol")
-print(f"Consumed O2: {m[consumed_O2].as_decimal(2)} mol\\n")
-
-print(f"Remaining C3H8: {initial_C3H8 - float(m[consumed_C3H8].as_decimal(2))} mol")
-print(f"Remaining O2: {initial_O2 - float(m[consumed_O2].as_decimal(2))} mol")
+REPORT_FUNCS = '''# Should be imported
+''' + REPORT
+
+MODEL_CODE = '''m = opt.model()
+
+# Read each value from the model once, as an exact fraction
+values = extract(m, {
+    'extent': extent,
+    'produced_CO2': produced_CO2,
+    'produced_H2O': produced_H2O,
+    'consumed_C3H8': consumed_C3H8,
+    'consumed_O2': consumed_O2,
+})
+
+# The remaining amounts are computed exactly, and only rounded when printed
+remaining = record_type(('remaining_C3H8', 'remaining_O2'))(initial_C3H8 - values.consumed_C3H8,
+                                                            initial_O2 - values.consumed_O2)
+
+print(format_record(values, labels={'extent': 'Reaction Extent',
+                                    'produced_CO2': 'CO2 Produced',
+                                    'produced_H2O': 'H2O Produced',
+                                    'consumed_C3H8': 'Consumed C3H8',
+                                    'consumed_O2': 'Consumed O2'}))
+print()
+print(format_record(remaining, labels={'remaining_C3H8': 'Remaining C3H8',
+                                       'remaining_O2': 'Remaining O2'}))
 '''
 
 
@@ -126,6 +144,7 @@ mynotebook['cells'] = [nbf.v4.new_markdown_cell(INTRO),
                        nbf.v4.new_code_cell(OPTIMIZER_CODE),
                        nbf.v4.new_code_cell(CHECK_OPT),
                        nbf.v4.new_markdown_cell(MODEL),
+                       nbf.v4.new_code_cell(REPORT_FUNCS),
                        nbf.v4.new_code_cell(MODEL_CODE)]
 
 nbf.validator.normalize( mynotebook )
@@ -0,0 +1,95 @@
+from collections import namedtuple
+from fractions import Fraction
+
+import numpy as np
+
+Reaction = namedtuple("Reaction", ["reactants", "products"])
+Reaction.__doc__ = """
+A balanced reaction, e.g. Reaction({'C3H8': 1, 'O2': 5}, {'CO2': 3, 'H2O': 4}).
+Each side maps a species to its stoichiometric coefficient.
+"""
+
+Limiting = namedtuple("Limiting", ["extent", "limiting", "consumed", "produced", "remaining"])
+Limiting.__doc__ = """
+Results for N sets of initial amounts: extent (N,), the index of the limiting reactant (N,),
+consumed and remaining amounts of each reactant (N, k) and produced amounts of each product (N, p).
+Columns follow the order of reaction.reactants and reaction.products.
+"""
+
+
+def limiting_reactant(reaction, initial):
+    """
+    Solves the limiting reactant problem for every row of initial, an (N, k) array of the initial
+    amounts of the k reactants (a single row of k amounts also works).
+
+    The extent is the largest x with coefficient * x <= initial for every reactant, i.e. the minimum
+    over reactants of initial / coefficient, so no solver is needed.
+    """
+    reactant_coef = np.array(list(reaction.reactants.values()), dtype=float)
+    product_coef = np.array(list(reaction.products.values()), dtype=float)
+    initial = np.atleast_2d(np.asarray(initial, dtype=float))
+    if initial.shape[1] != len(reactant_coef):
+        raise ValueError(f"expected {len(reactant_coef)} initial amounts per row, got {initial.shape[1]}")
+    if (initial < 0).any():
+        raise ValueError("initial amounts must not be negative")
+
+    ratios = initial / reactant_coef
+    limiting = ratios.argmin(axis=1)
+    extent = ratios[np.arange(len(ratios)), limiting]
+
+    consumed = extent[:, None] * reactant_coef
+    produced = extent[:, None] * product_coef
+    # The limiting reactant is used up exactly, without rounding error
+    remaining = initial - consumed
+    remaining[np.arange(len(remaining)), limiting] = 0
+    return Limiting(extent, limiting, consumed, produced, remaining)
+
+
+def limiting_names(reaction, result):
+    """Returns the name of the limiting reactant of each row"""
+    names = np.array(list(reaction.reactants), dtype=object)
+    return names[result.limiting]
+
+
+def optimize_model(reaction, initial):
+    """
+    Builds the notebook's Optimize model for one set of initial amounts: consumed_*, produced_*
+    and extent variables, with the extent maximized. Returns the optimizer and its variables.
+    """
+    from z3 import Optimize, Real
+
+    opt = Optimize()
+    extent = Real("X")
+    consumed = {}
+    produced = {}
+    for (name, coef), amount in zip(reaction.reactants.items(), initial):
+        consumed[name] = Real(f"Consumed_{{{name}}}")
+        opt.add(consumed[name] == extent * coef)
+        opt.add(consumed[name] <= Fraction(amount).limit_denominator(10**12))
+    for name, coef in reaction.products.items():
+        produced[name] = Real(f"Produced_{{{name}}}")
+        opt.add(produced[name] == extent * coef)
+    opt.add(extent >= 0)
+    opt.maximize(extent)
+    return opt, extent, consumed, produced
+
+
+def verify(reaction, initial, result=None, rows=None, tolerance=1e-9):
+    """
+    Checks the vectorized results against Z3's Optimize, for the given rows (default: all).
+    Returns the list of rows whose extent does not match.
+    """
+    from z3 import sat
+
+    initial = np.atleast_2d(np.asarray(initial, dtype=float))
+    result = result if result is not None else limiting_reactant(reaction, initial)
+    mismatches = []
+    for i in (range(len(initial)) if rows is None else rows):
+        opt, extent, _, _ = optimize_model(reaction, initial[i])
+        if opt.check() != sat:
+            mismatches.append(i)
+            continue
+        expected = float(opt.model()[extent].as_fraction())
+        if abs(expected - result.extent[i]) > tolerance * max(1.0, abs(expected)):
+            mismatches.append(i)
+    return mismatches
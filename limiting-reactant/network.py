@@ -0,0 +1,84 @@
+from collections import namedtuple
+from fractions import Fraction
+
+from z3 import Optimize, Real, Sum, sat, is_int_value, is_rational_value
+
+NetworkResult = namedtuple("NetworkResult", ["extents", "amounts", "objective"])
+NetworkResult.__doc__ = """
+Optimal operation of a reaction network for one feed: the extent of each reaction, the final amount
+of each species and the value of the objective, all as exact Fractions.
+"""
+
+
+class ReactionNetwork:
+    """
+    Several reactions sharing feedstocks, with one extent per reaction, optimized for a weighted
+    yield of the final species amounts.
+
+    The balance constraints and the objective are built once on a persistent Optimize. Each feed is
+    added inside a push/pop scope, so repeated what-if queries only add one equality per species.
+    """
+
+    def __init__(self, reactions, objective):
+        # reactions: list of engine.Reaction, objective: {species: weight} on final amounts
+        self.reactions = list(reactions)
+        self.species = []
+        for reaction in self.reactions:
+            for name in list(reaction.reactants) + list(reaction.products):
+                if name not in self.species:
+                    self.species.append(name)
+        unknown = set(objective) - set(self.species)
+        if unknown:
+            raise ValueError(f"objective uses species not in the network: {sorted(unknown)}")
+
+        self.extents = [Real(f"X_{i}") for i in range(len(self.reactions))]
+        self.feed = {name: Real(f"Feed_{{{name}}}") for name in self.species}
+        self.final = {name: Real(f"Final_{{{name}}}") for name in self.species}
+
+        self.opt = Optimize()
+        for extent in self.extents:
+            self.opt.add(extent >= 0)
+
+        # Shared species balance: final = feed + produced - consumed, summed over every reaction
+        for name in self.species:
+            terms = [self.feed[name]]
+            for extent, reaction in zip(self.extents, self.reactions):
+                net = reaction.products.get(name, 0) - reaction.reactants.get(name, 0)
+                if net:
+                    terms.append(net * extent)
+            self.opt.add(self.final[name] == Sum(terms))
+            self.opt.add(self.final[name] >= 0)
+
+        self.objective = self.opt.maximize(Sum([w * self.final[name] for name, w in objective.items()]))
+
+    def solve(self, feed):
+        """Returns the NetworkResult that maximizes the objective for a {species: amount} feed"""
+        unknown = set(feed) - set(self.species)
+        if unknown:
+            raise ValueError(f"feed contains species not in the network: {sorted(unknown)}")
+
+        self.opt.push()
+        try:
+            for name in self.species:
+                self.opt.add(self.feed[name] == feed.get(name, 0))
+            if self.opt.check() != sat:
+                raise ValueError("the feed admits no feasible operation")
+            value = self.objective.value()
+            if is_int_value(value):
+                value = Fraction(value.as_long())
+            elif is_rational_value(value):
+                value = value.as_fraction()
+            else:
+                raise ValueError(f"the objective is unbounded ({value})")
+            m = self.opt.model()
+            extents = [m.eval(x, model_completion=True).as_fraction() for x in self.extents]
+            amounts = {name: m.eval(self.final[name], model_completion=True).as_fraction()
+                       for name in self.species}
+            return NetworkResult(extents, amounts, value)
+        finally:
+            self.opt.pop()
+
+    def what_if(self, feeds):
+        """Yields the result for each feed in turn, reusing the same optimizer"""
+        for feed in feeds:
+            yield self.solve(feed)
@@ -0,0 +1,49 @@
+from collections import namedtuple
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+from z3 import is_int_value, is_rational_value
+
+
+@lru_cache(maxsize=None)
+def record_type(fields):
+    """Returns a namedtuple type with the given field names, shared by every run with the same fields"""
+    return namedtuple("ModelValues", fields)
+
+
+def as_fraction(value):
+    """Converts a Z3 numeral to an exact Fraction"""
+    if is_int_value(value):
+        return Fraction(value.as_long())
+    if is_rational_value(value):
+        return value.as_fraction()
+    raise ValueError(f"{value} is not a rational number")
+
+
+def extract(m, variables):
+    """
+    Reads every variable from a model once, as exact Fractions.
+    variables maps a field name to a Z3 expression, e.g. {'extent': extent, 'produced_CO2': produced_CO2},
+    and the result is a namedtuple with those fields.
+    """
+    fields = tuple(variables)
+    values = [as_fraction(m.eval(variables[name], model_completion=True)) for name in fields]
+    return record_type(fields)(*values)
+
+
+def to_array(records, exact=False):
+    """Stacks records into an (N, fields) NumPy array, of floats or of exact Fractions"""
+    return np.array([tuple(r) for r in records], dtype=object if exact else float)
+
+
+def format_value(value, places=2):
+    # Round the exact value, only converting to a decimal string for display
+    return f"{float(round(value, places)):.{places}f}"
+
+
+def format_record(record, labels=None, units="mol", places=2):
+    """Returns one 'label: value unit' line per field"""
+    labels = labels or {}
+    return "\n".join(f"{labels.get(name, name)}: {format_value(value, places)} {units}".rstrip()
+                     for name, value in zip(record._fields, record))
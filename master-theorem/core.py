@@ -1,5 +1,10 @@
 import nbformat as nbf
-import base64
+import os
+import sys
+
+# notebook_assets is shared with the other notebooks and lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notebook_assets import Image
 
 IMPORTS = '''!pip install z3-solver
 !pip install git+https://github.com/crrivero/FormalMethodsTasting.git#subdirectory=core
@@ -8,13 +13,8 @@ from tofmcore import showSolver
 from math import log
 '''
 
-# Get image data
-# This function was written by the Google AI
-with open("master-theorem/plot.png", "rb") as f:
-    image_bytes = f.read()
-    encoded_plot = base64.b64encode(image_bytes).decode('utf-8')
-
-image_uri = f"data:image/png;base64,{encoded_plot}"
+# Get image data, re-encoded as a palette PNG to keep the notebook small
+image_uri = Image("master-theorem/plot.png", format="png")
 
 # The first few tutorial cells were taken from the ASYMPTOTIC-BOUNDS notebook.
 COMPARE_F_G_TEXT = f'''
@@ -1,5 +1,14 @@
+import inspect
 import nbformat as nbf
-import base64
+import os
+import sys
+
+# notebook_assets is shared with the other notebooks and lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notebook_assets import Image
+
+# The notebook's edge parser is copied from zindex.py, which sits next to this builder
+import zindex
 
 IMPORTS = '''!pip install z3-solver
 !pip install git+https://github.com/crrivero/FormalMethodsTasting.git#subdirectory=core
@@ -7,99 +16,98 @@ from z3 import *
 from tofmcore import showSolver
 '''
 
-# Get image data for displaying molecule structures
-with open("matching/isomer1.png", "rb") as f:
-    image_bytes = f.read()
-    encoded_img = base64.b64encode(image_bytes).decode('utf-8')
+# Image data for displaying molecule structures, re-encoded as palette PNGs (WebP for the JPEG) to keep the notebook small
+isomer1 = Image("matching/isomer1.png", format="png")
+isomer2 = Image("matching/isomer2.jpg", format="webp")
+isomer3 = Image("matching/isomer3.png", format="png")
 
-isomer1 = f"data:image/png;base64,{encoded_img}"
+# Image data for displaying chemical graphs
+graph1 = Image("matching/graph1.png", format="png")
+graph2 = Image("matching/graph2.png", format="png")
+graph3 = Image("matching/graph3.png", format="png")
 
-with open("matching/isomer2.jpg", "rb") as f:
-    image_bytes = f.read()
-    encoded_img = base64.b64encode(image_bytes).decode('utf-8')
 
-isomer2 = f"data:image/png;base64,{encoded_img}"
+# The notebook reads edge variable names with the same parser as zindex.py
+EDGE_PARSER = f'''import re
 
-with open("matching/isomer3.png", "rb") as f:
-    image_bytes = f.read()
-    encoded_img = base64.b64encode(image_bytes).decode('utf-8')
+EDGE_NAME = re.compile({zindex.EDGE_NAME.pattern!r})
 
-isomer3 = f"data:image/png;base64,{encoded_img}"
+{inspect.getsource(zindex.edge_from_name)}'''
 
-# Get image data for displaying chemical graphs
-with open("matching/graph1.png", "rb") as f:
-    image_bytes = f.read()
-    encoded_img = base64.b64encode(image_bytes).decode('utf-8')
-
-graph1 = f"data:image/png;base64,{encoded_img}"
+EXTRA_IMPORTS = '''### SHOULD BE IMPORTED ###
+''' + EDGE_PARSER + '''
+def draw_all_matchings(s, all_sols, num_center):
+  # Draw in a grid with 3 columns, the figure grows with the number of rows
+  rows = max(1, -(-len(all_sols) // 3))
+  fig, axs = plt.subplots(rows,3, figsize=(12,4*rows))
+  axes = axs.flatten()
 
-with open("matching/graph2.png", "rb") as f:
-    image_bytes = f.read()
-    encoded_img = base64.b64encode(image_bytes).decode('utf-8')
+  # Hide the unused spots in the last row
+  for ax in axes[len(all_sols):]:
+    ax.axis('off')
 
-graph2 = f"data:image/png;base64,{encoded_img}"
+  # Nothing to draw until the constraints have solutions
+  if not all_sols:
+    return
 
-with open("matching/graph3.png", "rb") as f:
-    image_bytes = f.read()
-    encoded_img = base64.b64encode(image_bytes).decode('utf-8')
+  # Every solution has the same edge variables, so look up their carbons only once
+  edge_index = build_edge_index(all_sols[0])
+  for i, sol in enumerate(all_sols):
+    draw_single_matching(sol, axes[i], num_center, edge_index)
 
-graph3 = f"data:image/png;base64,{encoded_img}"
+def build_edge_index(m):
+  # Map each edge variable to the two carbons it connects, e.g. e_{12} -> ('1', '2')
+  # Labels with more than one digit are separated by a comma, e.g. e_{9,10} -> ('9', '10')
+  return {d.name(): edge_from_name(d.name()) for d in m}
 
+def draw_single_matching(m, ax, num_center, edge_index=None):
+  if edge_index is None:
+    edge_index = build_edge_index(m)
 
-EXTRA_IMPORTS = '''### SHOULD BE IMPORTED ###
-def draw_all_matchings(s, all_sols, num_center):
-  # Draw in a grid with 3 columns
-  rows = (len(all_sols) // 3) + 1
-  fig, axs = plt.subplots(rows,3, figsize=(12,12))
-  axes = axs.flatten()
+  # The edges selected in this matching
+  matching = [edge_index[d.name()] for d in m if is_true(m[d])]
 
-  for i, sol in enumerate(all_sols):
-    draw_single_matching(sol, axes[i], num_center)
-
-def draw_single_matching(m, ax, num_center):
-  # Create the edges and the matchings from the solution
-  edges = []
-  matching = []
-  for i in m:
-    val = m[i]
-    a = str(i)[3]
-    b = str(i)[4]
-    edges.append((a, b))
-    if val:
-      matching.append((a, b))
-
-  # Create the graph from the edges.
-  G = nx.Graph()
-  G.add_edges_from(sorted(edges)) # Sorting ensures consisten layout of nodes
-  edge_colors = ['red' if e in matching or (e[1], e[0]) in matching else 'black' for e in G.edges()]
+  edges = sorted(edge_index.values()) # Sorting ensures consisten layout of nodes
+  edge_colors = ['red' if e in matching else 'black' for e in edges]
 
   # Draw graph aligned to grid
-  draw_chemical_graph(G, edge_colors, [str(i+1) for i in range(num_center)], ax)
+  draw_chemical_graph(edges, edge_colors, [str(i+1) for i in range(num_center)], ax)
+
+# Node positions for each molecule, so they are only computed once and not for every matching
+chemical_graph_layouts = {}
 
 ### Written by Gemini ###
-def draw_chemical_graph(G, edge_colors, centerline_nodes, ax):
+def draw_chemical_graph(edges, edge_colors, centerline_nodes, ax):
     """
     centerline_nodes: a list of nodes to be placed on the y=0 axis.
     """
-    pos = {}
+    key = (tuple(edges), tuple(centerline_nodes))
+    if key not in chemical_graph_layouts:
+        G = nx.Graph()
+        G.add_edges_from(edges)
+        pos = {}
+
+        # 1. Position the centerline nodes
+        for i, node in enumerate(centerline_nodes):
+            pos[node] = (i, 0)
+
+        # 2. Position the children above/below
+        for parent in centerline_nodes:
+            # Find neighbors not already in the centerline
+            children = [n for n in G.neighbors(parent) if n not in centerline_nodes]
 
-    # 1. Position the centerline nodes
-    for i, node in enumerate(centerline_nodes):
-        pos[node] = (i, 0)
+            for i, child in enumerate(children):
+                # Alternate: even index above (1), odd index below (-1)
+                x_offset = pos[parent][0]
+                y_offset = 1 if i % 2 == 0 else -1
+                pos[child] = (x_offset, y_offset)
 
-    # 2. Position the children above/below
-    for parent in centerline_nodes:
-        # Find neighbors not already in the centerline
-        children = [n for n in G.neighbors(parent) if n not in centerline_nodes]
+        chemical_graph_layouts[key] = (G, pos)
 
-        for i, child in enumerate(children):
-            # Alternate: even index above (1), odd index below (-1)
-            x_offset = pos[parent][0]
-            y_offset = 1 if i % 2 == 0 else -1
-            pos[child] = (x_offset, y_offset)
+    G, pos = chemical_graph_layouts[key]
 
-    # Draw the graph
-    nx.draw(G, pos, with_labels=True, node_size=700,
+    # Draw the graph, only the edge colors change between matchings
+    nx.draw(G, pos, edgelist=edges, with_labels=True, node_size=700,
             node_color='white', edge_color=edge_colors, ax=ax)'''
 
 INTRO = f'''## Matching using Z3
@@ -0,0 +1,101 @@
+import math
+from itertools import islice
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+
+def centerline_layout(edges, centerline_nodes):
+    """Places the centerline nodes on y=0 and their other neighbors alternately above and below"""
+    neighbors = {}
+    for a, b in edges:
+        neighbors.setdefault(a, []).append(b)
+        neighbors.setdefault(b, []).append(a)
+
+    pos = {node: (i, 0) for i, node in enumerate(centerline_nodes)}
+    for parent in centerline_nodes:
+        children = [n for n in neighbors.get(parent, []) if n not in centerline_nodes]
+        for i, child in enumerate(children):
+            pos[child] = (pos[parent][0], 1 if i % 2 == 0 else -1)
+    return pos
+
+
+def solution_bits(solutions, num_edges):
+    """Converts solutions (bit-vector ints or sequences of booleans) to a boolean matrix, one row per solution"""
+    nbytes = max(1, (num_edges + 7) // 8)
+    rows = []
+    for sol in solutions:
+        if isinstance(sol, (int, np.integer)):
+            raw = np.frombuffer(int(sol).to_bytes(nbytes, "little"), np.uint8)
+            rows.append(np.unpackbits(raw, bitorder="little")[:num_edges])
+        else:
+            rows.append(np.asarray(sol, dtype=np.uint8))
+    return np.array(rows, dtype=bool).reshape(len(rows), num_edges)
+
+
+def draw_matching_sheet(edges, bits, pos, ax, columns, labels=False):
+    """Draws one tile per row of bits on a single axes, with one LineCollection per edge color"""
+    nodes = list(pos)
+    node_index = {node: i for i, node in enumerate(nodes)}
+    points = np.array([pos[node] for node in nodes], dtype=float)
+    ends = np.array([[node_index[a], node_index[b]] for a, b in edges])
+
+    # Tiles are spaced by the size of the molecule plus a one bond margin
+    width = np.ptp(points[:, 0]) + 1.5
+    height = np.ptp(points[:, 1]) + 1.5
+    count = len(bits)
+    tile = np.arange(count)
+    offsets = np.stack([tile % columns * width, -(tile // columns) * height], axis=1)
+
+    # segments[k, e] is edge e of tile k, as a pair of (x, y) points
+    segments = points[ends][None, :, :, :] + offsets[:, None, None, :]
+    ax.add_collection(LineCollection(segments[~bits], colors="black", linewidths=1, zorder=1))
+    ax.add_collection(LineCollection(segments[bits], colors="red", linewidths=2.5, zorder=2))
+
+    all_points = (points[None, :, :] + offsets[:, None, :]).reshape(-1, 2)
+    ax.scatter(all_points[:, 0], all_points[:, 1], s=20, c="white", edgecolors="black",
+               linewidths=0.5, zorder=3)
+    if labels:
+        names = [str(node) for node in nodes] * count
+        for (x, y), name in zip(all_points, names):
+            ax.text(x, y, name, fontsize=6, ha="center", va="center", zorder=4)
+
+    ax.set_xlim(points[:, 0].min() - 0.75, points[:, 0].min() - 0.75 + columns * width)
+    rows = math.ceil(count / columns)
+    ax.set_ylim(points[:, 1].max() + 0.75 - rows * height, points[:, 1].max() + 0.75)
+    ax.set_aspect("equal")
+    ax.axis("off")
+
+
+def render_matchings(edges, solutions, pos, out_prefix, per_sheet=400, columns=None,
+                     tile_inches=1.0, dpi=100, labels=None):
+    """
+    Renders every matching of one molecule to PNG sheets named out_prefix-000.png, out_prefix-001.png, ...
+
+    edges lists the molecule's edges in the same order as the solution bits (e.g. from
+    iter_solutions), and pos maps each node to its (x, y) position. Solutions are consumed
+    per_sheet at a time, so they can be streamed. Returns the list of written files.
+    """
+    edges = list(edges)
+    solutions = iter(solutions)
+    paths = []
+    while True:
+        bits = solution_bits(islice(solutions, per_sheet), len(edges))
+        if len(bits) == 0:
+            break
+
+        # Near-square grid of tiles, so the figure grows with the number of matchings
+        cols = columns or max(1, math.ceil(math.sqrt(len(bits))))
+        rows = math.ceil(len(bits) / cols)
+        xs = [p[0] for p in pos.values()]
+        ys = [p[1] for p in pos.values()]
+        aspect = (max(ys) - min(ys) + 1.5) / (max(xs) - min(xs) + 1.5)
+
+        fig, ax = plt.subplots(figsize=(cols * tile_inches, max(1, rows * tile_inches * aspect)))
+        draw_matching_sheet(edges, bits, pos, ax, cols, len(bits) <= 50 if labels is None else labels)
+        path = f"{out_prefix}-{len(paths):03d}.png"
+        fig.savefig(path, dpi=dpi, bbox_inches="tight")
+        plt.close(fig)
+        paths.append(path)
+    return paths
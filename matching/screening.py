@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# Level sequences list every node after its parent, as parent_z_index expects
+from zindex import parent_z_index
+
+# Carbon has four bonds, so alkane skeletons are trees with maximum degree 4
+MAX_VALENCE = 4
+
+COLUMNS = ["carbons", "isomer", "levels", "z_index", "max_degree", "branch_points"]
+
+
+### Skeleton generation ###
+# Free trees are enumerated as canonical level sequences (Wright, Richmond, Odlyzko and McKay, 1986).
+# Each tree is produced exactly once, in constant amortized time, without storing any previous trees.
+
+def _next_rooted_tree(levels, p=None):
+    if p is None:
+        p = len(levels) - 1
+        while levels[p] == 1:
+            p -= 1
+    if p == 0:
+        return None
+    q = p - 1
+    while levels[q] != levels[p] - 1:
+        q -= 1
+    result = list(levels)
+    for i in range(p, len(result)):
+        result[i] = result[i - p + q]
+    return result
+
+
+def _split_tree(levels):
+    # Splits off the first subtree of the root (left) from the rest of the tree
+    m = len(levels)
+    ones = [i for i, level in enumerate(levels) if level == 1]
+    if len(ones) > 1:
+        m = ones[1]
+    left = [level - 1 for level in levels[1:m]]
+    rest = [0] + levels[m:]
+    return left, rest
+
+
+def _next_tree(candidate):
+    left, rest = _split_tree(candidate)
+    left_height = max(left)
+    rest_height = max(rest)
+    valid = rest_height >= left_height
+    if valid and rest_height == left_height:
+        if len(left) > len(rest) or (len(left) == len(rest) and left > rest):
+            valid = False
+    if valid:
+        return candidate
+
+    p = len(left)
+    new_candidate = _next_rooted_tree(candidate, p)
+    if candidate[p] > 2:
+        new_left, _ = _split_tree(new_candidate)
+        suffix = list(range(1, max(new_left) + 2))
+        new_candidate[-len(suffix):] = suffix
+    return new_candidate
+
+
+def free_trees(order):
+    """Yields the level sequence of every non-isomorphic tree with the given number of nodes"""
+    if order == 1:
+        yield (0,)
+        return
+    if order == 2:
+        yield (0, 1)
+        return
+    # Start with the path rooted at its center
+    levels = list(range(order // 2 + 1)) + list(range(1, (order + 1) // 2))
+    while levels is not None:
+        levels = _next_tree(levels)
+        if levels is not None:
+            yield tuple(levels)
+            levels = _next_rooted_tree(levels)
+
+
+def parents(levels):
+    """Returns the parent index of every node of a level sequence (-1 for the root)"""
+    result = [-1] * len(levels)
+    last_at_level = []
+    for i, level in enumerate(levels):
+        del last_at_level[level:]
+        if level:
+            result[i] = last_at_level[level - 1]
+        last_at_level.append(i)
+    return result
+
+
+def degrees(parent):
+    degree = [0] * len(parent)
+    for child, p in enumerate(parent):
+        if p >= 0:
+            degree[child] += 1
+            degree[p] += 1
+    return degree
+
+
+def carbon_skeletons(carbons):
+    """Yields the level sequence of every constitutional isomer of the alkane with the given number of carbons"""
+    for levels in free_trees(carbons):
+        if max(degrees(parents(levels))) <= MAX_VALENCE:
+            yield levels
+
+
+def skeleton_edges(levels):
+    """Returns the carbon-carbon bonds of a skeleton, with carbons numbered from 1"""
+    return [(p + 1, child + 1) for child, p in enumerate(parents(levels)) if p >= 0]
+
+
+### Z index stage ###
+
+def score_batch(carbons, first_isomer, batch):
+    columns = {name: [] for name in COLUMNS}
+    for offset, levels in enumerate(batch):
+        parent = parents(levels)
+        degree = degrees(parent)
+        columns["carbons"].append(carbons)
+        columns["isomer"].append(first_isomer + offset)
+        columns["levels"].append("".join(map(_level_char, levels)))
+        columns["z_index"].append(parent_z_index(parent))
+        columns["max_degree"].append(max(degree))
+        columns["branch_points"].append(sum(d > 2 for d in degree))
+    return columns
+
+
+def _level_char(level):
+    # One character per node keeps the column compact: levels 0-9 then a-z
+    return "0123456789abcdefghijklmnopqrstuvwxyz"[level]
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+### Output and checkpoints ###
+
+def _write_part(out_dir, name, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.table({
+        "carbons": pa.array(columns["carbons"], pa.int16()),
+        "isomer": pa.array(columns["isomer"], pa.int64()),
+        "levels": pa.array(columns["levels"], pa.string()),
+        "z_index": pa.array(columns["z_index"], pa.int64()),
+        "max_degree": pa.array(columns["max_degree"], pa.int8()),
+        "branch_points": pa.array(columns["branch_points"], pa.int16()),
+    })
+    path = os.path.join(out_dir, name)
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def load_checkpoint(out_dir):
+    try:
+        with open(os.path.join(out_dir, "_checkpoint.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(out_dir, checkpoint):
+    path = os.path.join(out_dir, "_checkpoint.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def screen(max_carbons, out_dir, min_carbons=1, workers=None, batch_size=20000):
+    """
+    Computes the Z index of every alkane isomer from min_carbons to max_carbons.
+    Results are written as one Parquet file per batch in out_dir, and _checkpoint.json records
+    the completed batches so an interrupted run resumes where it stopped.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint = load_checkpoint(out_dir)
+    # Batch numbers in the checkpoint are only meaningful for the batch size they were written with
+    if checkpoint.setdefault("batch_size", batch_size) != batch_size:
+        raise ValueError(f"{out_dir} was started with batch_size={checkpoint['batch_size']}")
+    workers = workers or os.cpu_count()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for carbons in range(min_carbons, max_carbons + 1):
+            key = str(carbons)
+            done = checkpoint.get(key, {"batches": 0, "isomers": 0, "complete": False})
+            if done["complete"]:
+                continue
+
+            # Regenerating skipped skeletons is much cheaper than scoring them
+            todo = enumerate(batches(carbon_skeletons(carbons), batch_size))
+            todo = islice(todo, done["batches"], None)
+
+            # Keep a bounded number of batches in flight so memory stays flat, and write them in order
+            pending = deque()
+            for index, batch in todo:
+                first = index * batch_size
+                pending.append((index, pool.submit(score_batch, carbons, first, batch)))
+                if len(pending) >= 2 * workers:
+                    _finish(out_dir, checkpoint, key, *pending.popleft())
+            while pending:
+                _finish(out_dir, checkpoint, key, *pending.popleft())
+
+            checkpoint[key] = dict(checkpoint.get(key, done), complete=True)
+            save_checkpoint(out_dir, checkpoint)
+            print(f"C{carbons}: {checkpoint[key]['isomers']} isomers")
+    return checkpoint
+
+
+def _finish(out_dir, checkpoint, key, index, future):
+    columns = future.result()
+    _write_part(out_dir, f"C{int(key):02d}-part-{index:05d}.parquet", columns)
+    done = checkpoint.get(key, {"batches": 0, "isomers": 0, "complete": False})
+    checkpoint[key] = {"batches": index + 1,
+                       "isomers": done["isomers"] + len(columns["isomer"]),
+                       "complete": False}
+    save_checkpoint(out_dir, checkpoint)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen every alkane isomer by Z index.")
+    parser.add_argument("max_carbons", type=int)
+    parser.add_argument("out_dir")
+    parser.add_argument("--min-carbons", type=int, default=1)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    args = parser.parse_args(argv)
+    screen(args.max_carbons, args.out_dir, args.min_carbons, args.workers, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
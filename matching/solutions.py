@@ -0,0 +1,60 @@
+import time
+
+from z3 import Or, Not, sat, is_true
+
+
+def iter_solutions(s, vars, limit=None, timeout=None):
+    """
+    Yields every assignment of vars that satisfies s, as an int with bit i set when vars[i] is True.
+
+    Solutions are projected onto vars: each model is blocked with a clause over vars only, on the
+    same solver, so Z3 keeps what it learned between checks. The blocking clauses are removed
+    again when the generator finishes or is closed. Stops after limit solutions, or when
+    timeout seconds have passed; with a timeout the enumeration runs on a copy of s, so any timeout
+    the caller set on s is left alone.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if deadline is not None:
+        s = s.translate(s.ctx)
+    count = 0
+    s.push()
+    try:
+        while limit is None or count < limit:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                s.set("timeout", max(1, int(remaining * 1000)))
+            # unknown means the timeout was hit
+            if s.check() != sat:
+                return
+
+            m = s.model()
+            bits = 0
+            clause = []
+            for i, v in enumerate(vars):
+                if is_true(m.eval(v, model_completion=True)):
+                    bits |= 1 << i
+                    clause.append(Not(v))
+                else:
+                    clause.append(v)
+            s.add(Or(clause))
+            count += 1
+            yield bits
+    finally:
+        s.pop()
+
+
+def count_solutions(s, vars, limit=None, timeout=None):
+    """Counts the solutions of s projected onto vars without keeping them"""
+    return sum(1 for _ in iter_solutions(s, vars, limit, timeout))
+
+
+def selected(bits, vars):
+    """Returns the variables that are True in a solution"""
+    return [v for i, v in enumerate(vars) if bits >> i & 1]
+
+
+def as_dict(bits, vars):
+    """Returns a solution as a {variable name: value} dictionary"""
+    return {str(v): bool(bits >> i & 1) for i, v in enumerate(vars)}
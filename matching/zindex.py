@@ -0,0 +1,253 @@
+import re
+from functools import lru_cache
+
+# Edge variables follow the notebook convention: Bool('e_{12}') is the bond between carbons 1 and 2.
+# Labels with more than one digit must be separated by a comma, e.g. Bool('e_{9,10}').
+EDGE_NAME = re.compile(r"^e_\{([^}]*)\}$")
+
+
+def edge_from_name(name):
+    """Returns the endpoint pair encoded in an edge variable name"""
+    match = EDGE_NAME.match(name)
+    if match is None:
+        raise ValueError(f"not an edge variable: {name!r}")
+    body = match.group(1)
+    if "," in body:
+        a, b = body.split(",")
+    elif len(body) == 2:
+        a, b = body
+    else:
+        raise ValueError(f"ambiguous edge variable {name!r}, separate the labels with a comma")
+    return (a, b)
+
+
+def edges_from_vars(vars):
+    """Returns the list of edges encoded by a list of edge variables"""
+    return [edge_from_name(str(v)) for v in vars]
+
+
+def adjacency(edges):
+    adj = {}
+    for a, b in edges:
+        adj.setdefault(a, set()).add(b)
+        adj.setdefault(b, set()).add(a)
+    return adj
+
+
+def components(edges):
+    """Splits an edge list into the edge lists of its connected components"""
+    adj = adjacency(edges)
+    seen = set()
+    parts = []
+    for start in adj:
+        if start in seen:
+            continue
+        seen.add(start)
+        stack = [start]
+        nodes = set()
+        while stack:
+            node = stack.pop()
+            nodes.add(node)
+            for n in adj[node]:
+                if n not in seen:
+                    seen.add(n)
+                    stack.append(n)
+        parts.append([e for e in edges if e[0] in nodes])
+    return parts
+
+
+def _preorder_parents(edges):
+    """Returns a tree's nodes in DFS preorder and the position of each node's parent (-1 for the root)"""
+    adj = adjacency(edges)
+    root = edges[0][0]
+    nodes = []
+    parent = []
+    position = {}
+    stack = [(root, -1)]
+    while stack:
+        node, p = stack.pop()
+        position[node] = len(nodes)
+        nodes.append(node)
+        parent.append(p)
+        for n in adj[node]:
+            if n not in position:
+                stack.append((n, position[node]))
+    return nodes, parent
+
+
+def parent_z_index(parent):
+    """
+    Counts the matchings of a tree given as a parent array (-1 for the root), where every node
+    comes after its parent, in linear time
+    """
+    # free[v]: matchings of v's subtree where v is unmatched, matched[v]: those where v is matched
+    free = [1] * len(parent)
+    total = [1] * len(parent)
+    matched = [0] * len(parent)
+    # A reverse sweep visits children first, and needs no recursion for long chains
+    for child in range(len(parent) - 1, 0, -1):
+        total[child] = free[child] + matched[child]
+        p = parent[child]
+        # Either child stays unrestricted, or it is matched with p and must be free in its own subtree
+        matched[p] = matched[p] * total[child] + free[p] * free[child]
+        free[p] *= total[child]
+    return free[0] + matched[0]
+
+
+def tree_z_index(edges):
+    """Counts the matchings of a tree (including the empty one) in linear time"""
+    if not edges:
+        return 1
+    _, parent = _preorder_parents(edges)
+    return parent_z_index(parent)
+
+
+def is_tree(edges):
+    """Whether the edges form a single tree: connected, with one edge fewer than nodes"""
+    return len(edges) == len(adjacency(edges)) - 1 and len(components(edges)) == 1
+
+
+def _branch(part):
+    """Splits a cyclic component on an edge at its highest degree vertex: (G - e, G - u - v)"""
+    adj = adjacency(part)
+    u = max(adj, key=lambda n: len(adj[n]))
+    v = next(n for n in adj[u] if len(adj[n]) > 1)
+    e = (u, v) if (u, v) in part else (v, u)
+    without_edge = tuple(sorted(x for x in part if x != e))
+    without_nodes = tuple(sorted(x for x in part if u not in x and v not in x))
+    return without_edge, without_nodes
+
+
+# Subgraphs met while branching on cycles, bounded so long screening runs keep flat memory
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cyclic_z_index(edges):
+    # edges is a sorted tuple so equal subgraphs share a cache entry
+    if not edges:
+        return 1
+    total = 1
+    for part in components(list(edges)):
+        if is_tree(part):
+            total *= tree_z_index(part)
+            continue
+        # Z(G) = Z(G - e) + Z(G - u - v)
+        without_edge, without_nodes = _branch(part)
+        total *= _cyclic_z_index(without_edge) + _cyclic_z_index(without_nodes)
+    return total
+
+
+def z_index(edges):
+    """Returns the Z index (number of matchings, including the empty one) of a graph given by its edges"""
+    edges = [tuple(sorted(map(str, e))) for e in edges]
+    if len(set(edges)) != len(edges):
+        raise ValueError("duplicate edge")
+    if is_tree(edges) or not edges:
+        return tree_z_index(edges)
+    return _cyclic_z_index(tuple(sorted(edges)))
+
+
+def z_index_from_vars(vars):
+    """Returns the Z index of the graph encoded by the notebook's edge variables"""
+    return z_index(edges_from_vars(vars))
+
+
+def _poly_add(p, q):
+    if len(p) < len(q):
+        p, q = q, p
+    return [a + (q[k] if k < len(q) else 0) for k, a in enumerate(p)]
+
+
+def _poly_mul(p, q):
+    result = [0] * (len(p) + len(q) - 1)
+    for i, a in enumerate(p):
+        for j, b in enumerate(q):
+            result[i + j] += a * b
+    return result
+
+
+def _shift(p):
+    # Multiplies by x: one more edge in every matching
+    return [0] + p
+
+
+def tree_matching_polynomial(edges):
+    """Returns the matching polynomial coefficients of a tree, by the same DP as parent_z_index"""
+    if not edges:
+        return [1]
+    _, parent = _preorder_parents(edges)
+    free = [[1] for _ in parent]
+    matched = [[0] for _ in parent]
+    for child in range(len(parent) - 1, 0, -1):
+        total = _poly_add(free[child], matched[child])
+        p = parent[child]
+        matched[p] = _poly_add(_poly_mul(matched[p], total), _shift(_poly_mul(free[p], free[child])))
+        free[p] = _poly_mul(free[p], total)
+    return _poly_add(free[0], matched[0])
+
+
+def matching_polynomial(edges):
+    """Returns [m_0, m_1, ...] where m_k is the number of matchings with k edges"""
+    edges = tuple(sorted(tuple(sorted(map(str, e))) for e in edges))
+
+    # P(G) = P(G - e) + x P(G - u - v) for the cyclic components, evaluated with an explicit
+    # stack so large graphs do not hit the recursion limit
+    done = {}
+    stack = [edges]
+    while stack:
+        key = stack[-1]
+        if key in done:
+            stack.pop()
+            continue
+        result = [1]
+        missing = []
+        for part in components(list(key)):
+            if is_tree(part):
+                result = _poly_mul(result, tree_matching_polynomial(part))
+                continue
+            without_edge, without_nodes = _branch(part)
+            if without_edge in done and without_nodes in done:
+                result = _poly_mul(result, _poly_add(done[without_edge], _shift(done[without_nodes])))
+            else:
+                missing += [k for k in (without_edge, without_nodes) if k not in done]
+        if missing:
+            stack.extend(missing)
+        else:
+            done[key] = result
+            stack.pop()
+    return done[edges]
+
+
+def matching_constraints(vars):
+    """Returns the 'at most one selected edge per atom' constraints for the notebook's edge variables"""
+    from z3 import AtMost
+
+    by_atom = {}
+    for v, (a, b) in zip(vars, edges_from_vars(vars)):
+        by_atom.setdefault(a, []).append(v)
+        by_atom.setdefault(b, []).append(v)
+    return [AtMost(*edge_vars, 1) for edge_vars in by_atom.values() if len(edge_vars) > 1]
+
+
+def count_with_z3(s, vars):
+    """Counts the models of s projected onto vars by blocking each model and re-solving"""
+    from solutions import count_solutions
+
+    return count_solutions(s, vars)
+
+
+def cross_check(vars, s=None, max_edges=20):
+    """Compares the Z index against Z3 enumeration, returns the count or raises AssertionError"""
+    from z3 import Solver
+
+    if len(vars) > max_edges:
+        raise ValueError(f"graph has {len(vars)} edges, enumeration is limited to {max_edges}")
+    if s is None:
+        s = Solver()
+        s.add(matching_constraints(vars))
+    expected = count_with_z3(s, vars)
+    actual = z_index_from_vars(vars)
+    if actual != expected:
+        raise AssertionError(f"Z index {actual} does not match Z3 enumeration {expected}")
+    return actual
@@ -247,4 +247,4 @@ mynotebook['cells'] = [nbf.v4.new_markdown_cell(INTRO),
 
 nbf.validator.normalize( mynotebook )
 nbf.validate( mynotebook )
-nbf.write( mynotebook, "normalization-3nf/NORMALIZATION-3NF-CORE.ipynb" )
\ No newline at end of file
+nbf.write( mynotebook, "normalization-3nf/NORMALIZATION-ADVANCED-CORE.ipynb" )
\ No newline at end of file
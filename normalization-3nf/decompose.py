@@ -0,0 +1,236 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# keys adds the normalization folder to sys.path, for closure
+from keys import iter_keys
+from closure import FDSet, bits
+
+Relation = namedtuple("Relation", ["attributes", "fds"])
+Relation.__doc__ = """
+One relation of a decomposition: its attributes, in schema order, and the dependencies of the
+minimal cover that lie entirely inside it, as (lhs, rhs) lists of attribute names.
+"""
+
+
+def _as_fdset(F):
+    return F if isinstance(F, FDSet) else FDSet(*F)
+
+
+def _count(mask):
+    return bin(mask).count("1")
+
+
+def fds_within(F, mask):
+    """
+    Returns the indices of the dependencies whose left-hand side lies inside mask. Dependencies are
+    found through F's index from each attribute to the left-hand sides containing it, so only the
+    attributes of mask are visited, however many dependencies F has.
+    """
+    inside = [i for i, size in enumerate(F.sizes) if size == 0]
+    counts = {}
+    for a in bits(mask):
+        for i in F.by_attribute[a]:
+            counts[i] = counts.get(i, 0) + 1
+            if counts[i] == F.sizes[i]:
+                inside.append(i)
+    return inside
+
+
+def _relation(F, cover, mask):
+    names = F.schema.names
+    fds = [(names(lhs), names(rhs)) for lhs, rhs in cover if (lhs | rhs) & ~mask == 0]
+    return Relation(names(mask), fds)
+
+
+### 3NF synthesis ###
+
+def synthesize_3nf(F):
+    """
+    Decomposes a relation into 3NF relations that preserve every dependency and join losslessly
+    (Bernstein's synthesis): one relation per left-hand side of the minimal cover, plus a relation
+    for a candidate key when no relation contains one.
+    """
+    F = _as_fdset(F)
+    cover = F.minimal_cover()
+
+    # Group the minimal cover by left-hand side, keeping first-seen order
+    groups = {}
+    for lhs, rhs in cover:
+        groups[lhs] = groups.get(lhs, 0) | lhs | rhs
+    masks = list(groups.values())
+
+    if not any(F.closure(mask) == F.schema.all for mask in masks):
+        masks.append(next(iter_keys(F)))
+
+    # Drop relations contained in another one
+    kept = []
+    for i, mask in enumerate(masks):
+        if not any(j != i and mask & ~other == 0 and (mask != other or j < i) for j, other in enumerate(masks)):
+            kept.append(mask)
+    return [_relation(F, cover, mask) for mask in kept]
+
+
+### BCNF decomposition ###
+
+def _bcnf_violation(F, mask, closure):
+    """
+    Returns (lhs, rhs) bitsets of a dependency that holds on the attributes of mask but breaks BCNF
+    there, or None if the projection onto mask is in BCNF. closure computes F's closure of a bitset.
+    """
+    # Fast path: a dependency of F that fits inside the relation and does not determine all of it
+    for i in fds_within(F, mask):
+        lhs = F.fds[i][0]
+        determined = closure(lhs) & mask
+        if determined & ~lhs and determined != mask:
+            return lhs, determined & ~lhs
+
+    # Projected dependencies need not appear in F. A relation with more than two attributes can only
+    # break BCNF if some A is determined by the relation without A and another attribute B
+    # (Tsou and Fischer, 1982). Shrinking the relation while such a pair remains leads to a
+    # dependency Z - A -> A, kept only if Z - A does not determine the whole relation, so relations
+    # already in BCNF are not split.
+    def pairs(z):
+        for a in bits(z):
+            # closure(z - a - b) is inside closure(z - a), so most attributes are ruled out at once
+            if not closure(z & ~(1 << a)) >> a & 1:
+                continue
+            for b in bits(z & ~(1 << a)):
+                if closure(z & ~(1 << a) & ~(1 << b)) >> a & 1:
+                    yield a, b
+
+    def violates(lhs):
+        determined = closure(lhs) & mask
+        return determined != mask and determined & ~lhs
+
+    if _count(mask) <= 2:
+        return None
+    for a, b in pairs(mask):
+        lhs = mask & ~(1 << a) & ~(1 << b)
+        if violates(lhs):
+            return lhs, closure(lhs) & mask & ~lhs
+        z = mask & ~(1 << b)
+        pair = next(pairs(z), None) if _count(z) > 2 else None
+        while pair is not None:
+            a, b = pair
+            z &= ~(1 << b)
+            pair = next(pairs(z), None) if _count(z) > 2 else None
+        lhs = z & ~(1 << a)
+        if violates(lhs):
+            return lhs, closure(lhs) & mask & ~lhs
+    return None
+
+
+def bcnf_decompose(F):
+    """
+    Decomposes a relation into BCNF relations that join losslessly. Each relation that breaks BCNF
+    with X -> Y is split into X + Y and X + the rest; unlike 3NF synthesis, some dependencies may
+    no longer be checkable inside a single relation (see lost_dependencies).
+    """
+    F = _as_fdset(F)
+    cover = F.minimal_cover()
+    # The same attribute sets come up again in the relations split off from one another
+    closure = lru_cache(maxsize=None)(F.closure)
+    pending = [F.schema.all]
+    done = []
+    while pending:
+        mask = pending.pop()
+        # A relation inside another one adds nothing to the join, and splitting it again would
+        # repeat work, so it is dropped
+        if any(mask & ~other == 0 for other in pending + done):
+            continue
+        violation = _bcnf_violation(F, mask, closure)
+        if violation is None:
+            done.append(mask)
+            continue
+        lhs, rhs = violation
+        pending.append(mask & ~rhs)
+        pending.append(lhs | rhs)
+    done.sort(key=lambda m: (m & -m).bit_length())
+    return [_relation(F, cover, mask) for mask in done]
+
+
+### Checks ###
+
+def _masks(F, relations):
+    return [F.schema.mask(r.attributes if isinstance(r, Relation) else r) for r in relations]
+
+
+def chase(F, relations):
+    """
+    Runs the chase on the tableau of a decomposition: one row per relation, where 0 is the
+    distinguished symbol of a column and other values are row-specific. Each dependency X -> A
+    merges the A symbols of rows that agree on X, until nothing changes. Returns the final tableau.
+    """
+    F = _as_fdset(F)
+    masks = _masks(F, relations)
+    n = len(F.schema.attributes)
+    tableau = np.arange(1, len(masks) * n + 1, dtype=np.int64).reshape(len(masks), n)
+    for row, mask in enumerate(masks):
+        tableau[row, list(bits(mask))] = 0
+
+    # Dependencies sharing a left-hand side share the grouping of rows
+    by_lhs = {}
+    for lhs, rhs in F:
+        if rhs & ~lhs:
+            by_lhs[lhs] = by_lhs.get(lhs, 0) | rhs & ~lhs
+    checks = [(list(bits(lhs)), list(bits(rhs))) for lhs, rhs in by_lhs.items()]
+
+    changed = True
+    while changed:
+        changed = False
+        for lhs, rhs in checks:
+            _, groups = np.unique(tableau[:, lhs], axis=0, return_inverse=True)
+            groups = groups.ravel()
+            for a in rhs:
+                column = tableau[:, a]
+                lowest = np.full(groups.max() + 1, column.max())
+                np.minimum.at(lowest, groups, column)
+                target = lowest[groups]
+                if (target != column).any():
+                    # Rename each symbol to the smallest one it was equated with, preferring the
+                    # distinguished 0, everywhere in the column
+                    rename = np.arange(column.max() + 1)
+                    np.minimum.at(rename, column, target)
+                    tableau[:, a] = rename[column]
+                    changed = True
+    return tableau
+
+
+def is_lossless(F, relations):
+    """Whether joining the relations always gives back the original relation"""
+    return bool((chase(F, relations) == 0).all(axis=1).any())
+
+
+def lost_dependencies(F, relations):
+    """
+    Returns the dependencies of F that cannot be enforced by the relations' own dependencies, as
+    (lhs, rhs) attribute lists; an empty list means the decomposition preserves every dependency.
+    Each X -> Y is checked by growing X with what each relation determines about it, without
+    computing the projected dependencies.
+    """
+    F = _as_fdset(F)
+    masks = _masks(F, relations)
+    lost = []
+    for lhs, rhs in F:
+        if any((lhs | rhs) & ~mask == 0 for mask in masks):
+            continue
+        z = lhs
+        # The part of z last closed in each relation, to skip relations where z has not grown
+        seen = [-1] * len(masks)
+        grown = True
+        while grown and rhs & ~z:
+            grown = False
+            for i, mask in enumerate(masks):
+                inside = z & mask
+                if inside == seen[i]:
+                    continue
+                seen[i] = inside
+                new = F.closure(inside) & mask & ~z
+                if new:
+                    z |= new
+                    grown = True
+        if rhs & ~z:
+            lost.append((F.schema.names(lhs), F.schema.names(rhs)))
+    return lost
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+from collections import namedtuple
+
+# The closure engine lives with the first normalization notebook
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "normalization"))
+from closure import FDSet, bits
+
+CandidateKeys = namedtuple("CandidateKeys", ["keys", "prime", "non_prime", "complete"])
+CandidateKeys.__doc__ = """
+Every minimal key of a relation as a list of attribute lists, the prime attributes (in some key)
+and the non-prime attributes, in schema order. complete is False when the time budget ran out,
+in which case keys, and so prime, may be missing some.
+"""
+
+
+def attribute_roles(F):
+    """
+    Returns (core, never) bitsets: attributes on no right-hand side are in every key, and attributes
+    on some right-hand side but no left-hand side are in no key.
+    """
+    determined = 0
+    determining = 0
+    for lhs, rhs in F:
+        determined |= rhs & ~lhs
+        determining |= lhs
+    return F.schema.all & ~determined, determined & ~determining
+
+
+def _minimize(F, superkey, core):
+    # Drops attributes one at a time while the rest still determines the whole relation
+    for a in bits(superkey & ~core):
+        smaller = superkey & ~(1 << a)
+        if F.closure(smaller) == F.schema.all:
+            superkey = smaller
+    return superkey
+
+
+def iter_keys(F, timeout=None):
+    """
+    Yields each candidate key of F as a bitset as soon as it is found (Lucchesi and Osborn, 1978).
+
+    Starting from one key K, every dependency X -> Y gives the superkey X + (K - Y), which is reduced
+    to a new key unless it contains a known one. Repeating this for every key found finds them all,
+    with a closure per attempt instead of one per subset of attributes.
+    """
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    all_attributes = F.schema.all
+    core, never = attribute_roles(F)
+
+    first = _minimize(F, all_attributes & ~never, core)
+    keys = [first]
+    yield first
+
+    i = 0
+    while i < len(keys):
+        key = keys[i]
+        i += 1
+        for lhs, rhs in F:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise TimeoutError("candidate key search ran out of time")
+            superkey = (lhs | (key & ~rhs)) & ~never
+            # Supersets of known keys can only reduce to keys already found
+            if any(k & ~superkey == 0 for k in keys):
+                continue
+            new = _minimize(F, superkey, core)
+            if all(k != new for k in keys):
+                keys.append(new)
+                yield new
+
+
+def candidate_keys(F, timeout=None):
+    """
+    Returns the CandidateKeys of a relation, where F is an FDSet (or a (attributes, fds) pair).
+    With a timeout in seconds, returns the keys found so far once it runs out.
+    """
+    if not isinstance(F, FDSet):
+        F = FDSet(*F)
+    keys = []
+    complete = True
+    try:
+        for key in iter_keys(F, timeout):
+            keys.append(key)
+    except TimeoutError:
+        complete = False
+
+    prime = 0
+    for key in keys:
+        prime |= key
+    names = F.schema.names
+    return CandidateKeys([names(key) for key in keys], names(prime), names(F.schema.all & ~prime), complete)
@@ -0,0 +1,155 @@
+from collections import namedtuple
+
+# keys adds the normalization folder to sys.path, for closure and encoding
+from keys import candidate_keys
+from closure import FDSet, bits
+
+Violation = namedtuple("Violation", ["lhs", "rhs", "kind"])
+Violation.__doc__ = """
+A dependency lhs -> rhs (a list of attributes and one attribute) that breaks a normal form.
+kind is 'partial' (part of a key determines a non-prime attribute, breaking 2NF), 'transitive'
+(a non-key determines a non-prime attribute, breaking 3NF) or 'bcnf' (a non-key determines a
+prime attribute, which 3NF allows but BCNF does not).
+"""
+
+FORMS = {"2NF": ("partial",), "3NF": ("partial", "transitive"), "BCNF": ("partial", "transitive", "bcnf")}
+
+
+def _relation(F, keys):
+    if not isinstance(F, FDSet):
+        F = FDSet(*F)
+    if keys is None:
+        keys = candidate_keys(F).keys
+    return F, [F.schema.mask(key) for key in keys]
+
+
+def violations(F, keys=None, form="BCNF"):
+    """
+    Returns every Violation of form ('2NF', '3NF' or 'BCNF') in one pass, without stopping at the
+    first. F is an FDSet (or an (attributes, fds) pair) and keys its candidate keys, found if not given.
+
+    Partial dependencies come from the closure of each key without one of its attributes, which
+    also finds those that go through prime attributes. Transitive and BCNF violations come from
+    the minimal cover, each dependency classified from one closure of its left-hand side: a
+    violation implied by F always shows up in a cover with single attributes on the right.
+    """
+    if form not in FORMS:
+        raise ValueError(f"unknown normal form {form!r}, expected one of {list(FORMS)}")
+    F, keys = _relation(F, keys)
+    schema = F.schema
+    prime = 0
+    for key in keys:
+        prime |= key
+
+    found = []
+    seen = set()
+    for key in keys:
+        for k in bits(key):
+            part = key & ~(1 << k)
+            if part in seen:
+                continue
+            seen.add(part)
+            for a in bits(F.closure(part) & ~part & ~prime):
+                found.append(Violation(schema.names(part), schema.attributes[a], "partial"))
+    if form == "2NF":
+        return found
+
+    closures = {}
+    for lhs, rhs in F.minimal_cover():
+        if lhs not in closures:
+            closures[lhs] = F.closure(lhs)
+        if closures[lhs] == schema.all:
+            continue
+        if rhs & prime:
+            kind = "bcnf"
+        elif any(lhs & ~key == 0 for key in keys):
+            # Already reported with the key it is part of
+            continue
+        else:
+            kind = "transitive"
+        if kind in FORMS[form]:
+            found.append(Violation(schema.names(lhs), schema.names(rhs)[0], kind))
+    return found
+
+
+def is_2nf(F, keys=None):
+    return not violations(F, keys, "2NF")
+
+
+def is_3nf(F, keys=None):
+    return not violations(F, keys, "3NF")
+
+
+def is_bcnf(F, keys=None):
+    return not violations(F, keys, "BCNF")
+
+
+### Z3 cross-check ###
+
+def notebook_candidates(F, keys):
+    """
+    The dependencies the notebook's is_2nf and check_3nf test: a key without one of its attributes
+    determining a non-prime attribute, and one non-prime attribute determining another.
+    """
+    prime = 0
+    for key in keys:
+        prime |= key
+    non_prime = list(bits(F.schema.all & ~prime))
+
+    candidates = []
+    for key in keys:
+        if bin(key).count("1") > 1:
+            for k in bits(key):
+                candidates += [(key & ~(1 << k), 1 << a, "partial") for a in non_prime]
+    candidates += [(1 << a, 1 << b, "transitive") for a in non_prime for b in non_prime if a != b]
+    return candidates
+
+
+def z3_violations(F, keys=None, form="3NF"):
+    """
+    Finds the notebook's 2NF/3NF violations with a single Z3 query.
+
+    Two rows either agree or differ on each attribute, so one Boolean per attribute saying that
+    they differ encodes a pair of rows exactly, and every dependency X -> A becomes a Horn clause.
+    Candidates with the same left-hand side X share one copy of those Booleans, made to agree on X,
+    and the copy's Boolean for A is the indicator of the candidate X -> A. One Optimize check()
+    makes as many indicators true as it can: the rows can differ on every attribute outside the
+    closure of X at once, so the indicators left false in the model are exactly the candidates
+    that hold.
+
+    Like the notebook, this only tests single non-prime attributes against each other, so a
+    dependency such as {non-prime, prime} -> non-prime is only found by violations().
+    """
+    from z3 import And, Bool, Implies, Not, Optimize, is_true, sat, substitute
+
+    if form not in ("2NF", "3NF"):
+        raise ValueError(f"the Z3 check covers 2NF and 3NF, not {form!r}")
+    F, keys = _relation(F, keys)
+    schema = F.schema
+    candidates = [c for c in notebook_candidates(F, keys) if c[2] in FORMS[form]]
+
+    # Every dependency is built once, then copied per left-hand side inside Z3
+    differs = [Bool(f"differs.{a}") for a in schema.attributes]
+    dependencies = And([Implies(And([Not(differs[x]) for x in bits(X)]), Not(differs[y]))
+                        for X, Y in F for y in bits(Y)])
+
+    s = Optimize()
+    copies = {}
+    labels = []
+    for lhs, rhs, kind in candidates:
+        if lhs not in copies:
+            copy = [Bool(f"differs_{len(copies)}.{a}") for a in schema.attributes]
+            s.add(substitute(dependencies, *zip(differs, copy)))
+            s.add([Not(copy[x]) for x in bits(lhs)])
+            copies[lhs] = copy
+        label = copies[lhs][next(bits(rhs))]
+        s.add_soft(label)
+        labels.append(label)
+
+    # Rows that agree everywhere satisfy every dependency, so only a timeout can stop the query
+    if s.check() != sat:
+        raise TimeoutError(f"Z3 gave up: {s.reason_unknown()}")
+    m = s.model()
+    return [Violation(schema.names(lhs), schema.names(rhs)[0], kind)
+            for label, (lhs, rhs, kind) in zip(labels, candidates)
+            if not is_true(m.eval(label, model_completion=True))]
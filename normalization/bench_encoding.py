@@ -0,0 +1,75 @@
+import argparse
+import random
+import time
+
+from z3 import Solver
+
+from encoding import SORTS, make_rows, functional_dependency, has_fd
+
+# The relations from the notebooks, as (attributes, functional dependencies)
+R1 = (["studentID", "courseID", "studentName", "courseFee"],
+      [("studentID", "studentName"), ("courseID", "courseFee")])
+R2 = (["enrollmentID", "studentID", "studentName", "courseID", "courseName"],
+      [("enrollmentID", "studentID"), ("enrollmentID", "studentName"), ("studentID", "studentName"),
+       ("enrollmentID", "courseID"), ("enrollmentID", "courseName"), ("courseID", "courseName")])
+
+
+def synthetic_schema(num_attributes=50, num_fds=100, max_lhs=3, seed=0):
+    """A random schema with num_fds dependencies, each with 1 to max_lhs attributes on the left"""
+    rng = random.Random(seed)
+    attributes = [f"a{i}" for i in range(num_attributes)]
+    fds = []
+    for _ in range(num_fds):
+        lhs = rng.sample(attributes, rng.randint(1, max_lhs))
+        rhs = rng.choice([a for a in attributes if a not in lhs])
+        fds.append((lhs, rhs))
+    return attributes, fds
+
+
+def all_checks(attributes):
+    # Every single-attribute dependency X -> Y
+    return [(x, y) for x in attributes for y in attributes if x != y]
+
+
+def time_checks(attributes, fds, checks, sort):
+    """Returns (seconds per check, answers) for one solver holding every dependency"""
+    row1, row2 = make_rows(attributes, sort)
+    s = Solver()
+    for X, Y in fds:
+        s.add(functional_dependency(row1, row2, X, Y))
+
+    start = time.perf_counter()
+    answers = [has_fd(s, row1, row2, X, Y) for X, Y in checks]
+    return (time.perf_counter() - start) / len(checks), answers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare FD check latency of the row encodings.")
+    parser.add_argument("--attributes", type=int, default=50)
+    parser.add_argument("--fds", type=int, default=100)
+    parser.add_argument("--checks", type=int, default=200, help="random checks on each synthetic schema")
+    parser.add_argument("--schemas", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cases = [("R1", *R1, all_checks(R1[0])), ("R2", *R2, all_checks(R2[0]))]
+    for seed in range(args.schemas):
+        attributes, fds = synthetic_schema(args.attributes, args.fds, seed=seed)
+        checks = random.Random(seed).sample(all_checks(attributes), args.checks)
+        cases.append((f"synthetic-{seed}", attributes, fds, checks))
+
+    print(f"{'relation':<14}{'checks':>8}" + "".join(f"{sort:>16}" for sort in SORTS))
+    for name, attributes, fds, checks in cases:
+        timings = []
+        expected = None
+        for sort in SORTS:
+            seconds, answers = time_checks(attributes, fds, checks, sort)
+            # Every encoding must give the same answers
+            if expected is not None and answers != expected:
+                raise AssertionError(f"{sort} disagrees with {SORTS[0]} on {name}")
+            expected = answers
+            timings.append(seconds)
+        print(f"{name:<14}{len(checks):>8}" + "".join(f"{seconds * 1e3:>13.3f} ms" for seconds in timings))
+
+
+if __name__ == "__main__":
+    main()
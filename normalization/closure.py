@@ -0,0 +1,166 @@
+class Schema:
+    """The attributes of a relation. Sets of attributes are encoded as int bitsets, bit i for attributes[i]."""
+
+    def __init__(self, attributes):
+        self.attributes = list(attributes)
+        self.index = {a: i for i, a in enumerate(self.attributes)}
+        if len(self.index) != len(self.attributes):
+            raise ValueError("duplicate attribute")
+        self.all = (1 << len(self.attributes)) - 1
+
+    def mask(self, attributes):
+        """Returns the bitset of an attribute name, or of a list of names"""
+        if isinstance(attributes, int):
+            return attributes
+        if isinstance(attributes, str):
+            attributes = [attributes]
+        mask = 0
+        for a in attributes:
+            if a not in self.index:
+                raise KeyError(f"unknown attribute {a!r}")
+            mask |= 1 << self.index[a]
+        return mask
+
+    def names(self, mask):
+        """Returns the attribute names in a bitset, in schema order"""
+        return [a for i, a in enumerate(self.attributes) if mask >> i & 1]
+
+
+def bits(mask):
+    """Yields the index of every set bit"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class FDSet:
+    """
+    A set of functional dependencies X -> Y over a schema, where X and Y are attribute sets.
+    Each attribute is indexed to the dependencies whose left-hand side contains it, so a closure
+    visits every dependency at most once (Beeri and Bernstein's linear-time algorithm).
+    """
+
+    def __init__(self, schema, fds=()):
+        self.schema = schema if isinstance(schema, Schema) else Schema(schema)
+        self.fds = []
+        self.by_attribute = [[] for _ in self.schema.attributes]
+        self.sizes = []
+        for X, Y in fds:
+            self.add(X, Y)
+
+    def add(self, X, Y):
+        """Adds X -> Y, where X and Y are attribute names, lists of names or bitsets"""
+        lhs, rhs = self.schema.mask(X), self.schema.mask(Y)
+        i = len(self.fds)
+        self.fds.append((lhs, rhs))
+        self.sizes.append(bin(lhs).count("1"))
+        for a in bits(lhs):
+            self.by_attribute[a].append(i)
+        return i
+
+    def __iter__(self):
+        return iter(self.fds)
+
+    def __len__(self):
+        return len(self.fds)
+
+    def closure(self, X):
+        """Returns the bitset of every attribute determined by X"""
+        result = self.schema.mask(X)
+        missing = list(self.sizes)
+        queue = list(bits(result))
+        for i, size in enumerate(self.sizes):
+            if size == 0:
+                queue.extend(bits(self.fds[i][1] & ~result))
+                result |= self.fds[i][1]
+        while queue:
+            a = queue.pop()
+            for i in self.by_attribute[a]:
+                missing[i] -= 1
+                if missing[i] == 0:
+                    rhs = self.fds[i][1]
+                    queue.extend(bits(rhs & ~result))
+                    result |= rhs
+        return result
+
+    def implies(self, X, Y):
+        """Whether X -> Y follows from the dependencies by Armstrong's axioms"""
+        rhs = self.schema.mask(Y)
+        return self.closure(X) & rhs == rhs
+
+    def minimal_cover(self):
+        """
+        Returns an equivalent FDSet where every right-hand side is a single attribute, no left-hand
+        side has an extraneous attribute and no dependency is redundant.
+        """
+        # 1. Split right-hand sides into single attributes
+        split = []
+        for lhs, rhs in self.fds:
+            for a in bits(rhs & ~lhs):
+                split.append((lhs, 1 << a))
+
+        # 2. Remove extraneous left-hand side attributes, checked against the original dependencies
+        reduced = []
+        for lhs, rhs in split:
+            for a in bits(lhs):
+                smaller = lhs & ~(1 << a)
+                if self.closure(smaller) & rhs:
+                    lhs = smaller
+            reduced.append((lhs, rhs))
+        reduced = list(dict.fromkeys(reduced))
+
+        # 3. Remove dependencies implied by the others
+        cover = list(reduced)
+        for fd in reduced:
+            others = FDSet(self.schema, [f for f in cover if f != fd])
+            if others.implies(*fd):
+                cover.remove(fd)
+        return FDSet(self.schema, cover)
+
+    def describe(self):
+        """Returns the dependencies as strings, e.g. ['studentID -> studentName']"""
+        names = self.schema.names
+        return [f"{', '.join(names(lhs)) or '{}'} -> {', '.join(names(rhs))}" for lhs, rhs in self.fds]
+
+
+def closure(F, X):
+    return F.closure(X)
+
+
+def implies(F, X, Y):
+    return F.implies(X, Y)
+
+
+def minimal_cover(F):
+    return F.minimal_cover()
+
+
+def certificate(F, X, Y, sort="uninterpreted"):
+    """
+    Checks X -> Y with Z3, using the notebook's two-row encoding, as an independent proof.
+    Returns (True, dependencies used) when it holds, from the unsat core, or (False, counterexample)
+    with the two rows that agree on X but not on Y. sort picks the row encoding, see encoding.make_rows.
+    """
+    from z3 import Bool, Implies, Or, Solver, unsat
+    from encoding import agree, make_rows, value
+
+    schema = F.schema
+    row1, row2 = make_rows(schema.attributes, sort)
+
+    s = Solver()
+    labels = []
+    for i, (lhs, rhs) in enumerate(F.fds):
+        label = Bool(f"fd_{i}")
+        s.add(Implies(label, Implies(agree(row1, row2, schema.names(lhs)), agree(row1, row2, schema.names(rhs)))))
+        labels.append(label)
+    lhs, rhs = schema.mask(X), schema.mask(Y)
+    s.add(agree(row1, row2, schema.names(lhs)), Or([row1[a] != row2[a] for a in schema.names(rhs)]))
+
+    if s.check(*labels) == unsat:
+        used = {str(label) for label in s.unsat_core()}
+        return True, FDSet(schema, [fd for fd, label in zip(F.fds, labels) if str(label) in used])
+    m = s.model()
+    rows = ({a: value(m, row1[a]) for a in schema.attributes},
+            {a: value(m, row2[a]) for a in schema.attributes})
+    return False, rows
@@ -0,0 +1,63 @@
+from z3 import And, BitVec, Const, DeclareSort, Implies, Or, String, is_string_value, is_bv_value, unsat
+
+# Only equality between attribute values matters for functional dependencies, so an uninterpreted
+# sort (or a small bit-vector) gives the same answers as String without Z3's string solver
+SORTS = ("string", "uninterpreted", "bitvec")
+
+
+def make_rows(attributes, sort="uninterpreted", width=8, names=("A", "B")):
+    """
+    Creates the variables for two arbitrary rows of a relation, e.g. row1['studentID'] is A.studentID.
+    sort is 'string' (as in the notebooks), 'uninterpreted' (a DeclareSort per attribute) or
+    'bitvec' (a BitVec of the given width; two rows only ever need two distinct values).
+    names prefixes the variables, so one solver can hold several independent pairs of rows.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"unknown sort {sort!r}, expected one of {SORTS}")
+    first, second = names
+
+    row1, row2 = {}, {}
+    for a in attributes:
+        if sort == "string":
+            row1[a], row2[a] = String(f"{first}.{a}"), String(f"{second}.{a}")
+        elif sort == "uninterpreted":
+            domain = DeclareSort(f"{a}_value")
+            row1[a], row2[a] = Const(f"{first}.{a}", domain), Const(f"{second}.{a}", domain)
+        else:
+            row1[a], row2[a] = BitVec(f"{first}.{a}", width), BitVec(f"{second}.{a}", width)
+    return row1, row2
+
+
+def _names(attributes):
+    # A single attribute name, or a list of names
+    return [attributes] if isinstance(attributes, str) else list(attributes)
+
+
+def agree(row1, row2, attributes):
+    """The two rows have the same value for every attribute"""
+    return And([row1[a] == row2[a] for a in _names(attributes)])
+
+
+def functional_dependency(row1, row2, X, Y):
+    return Implies(agree(row1, row2, X), agree(row1, row2, Y))
+
+
+def has_fd(s, row1, row2, X, Y):
+    s.push()
+
+    # Look for two rows that agree on X but not on Y
+    s.add(agree(row1, row2, X), Or([row1[a] != row2[a] for a in _names(Y)]))
+    result = s.check() == unsat # If we can't find a counterexample, then X -> Y
+
+    s.pop()
+    return result
+
+
+def value(m, var):
+    """Reads an attribute value from a model as a string, whatever the encoding"""
+    v = m.eval(var, model_completion=True)
+    if is_string_value(v):
+        return v.as_string()
+    if is_bv_value(v):
+        return str(v.as_long())
+    return str(v)
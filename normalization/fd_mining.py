@@ -0,0 +1,384 @@
+import argparse
+import csv
+import heapq
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from closure import FDSet, bits
+
+CODE_DTYPE = np.int32
+LABEL_DTYPE = np.int32
+
+
+### Reading tables ###
+# Each column is replaced by integer codes, equal codes for equal values, and written to its own
+# file so the table is never held in memory; the search reads the files back as memory maps.
+# Codes are assigned by an external sort, so no dictionary of every distinct value is kept either:
+# each chunk writes its distinct values as a sorted run, and one merge of the runs numbers them.
+
+def _chunks(path, chunk_size):
+    """Yields pyarrow RecordBatches of at most about chunk_size rows from a CSV or Parquet file"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        yield from pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+        return
+
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    # Read every column as text, so values compare exactly as written
+    with open(path, newline="") as f:
+        header = next(csv.reader(f))
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=1 << 24),
+        convert_options=pacsv.ConvertOptions(column_types={name: pa.string() for name in header},
+                                             strings_can_be_null=False))
+    for batch in reader:
+        for start in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(start, chunk_size)
+
+
+def _comparable(column):
+    # Runs are sorted by Arrow and merged in Python, which agree on the order of text and bytes, so
+    # other types are compared through their text form
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    kind = column.type
+    if pa.types.is_string(kind) or pa.types.is_large_string(kind) or pa.types.is_binary(kind) \
+            or pa.types.is_large_binary(kind):
+        return column
+    return pc.cast(column, pa.string())
+
+
+def _write_run(column, path):
+    """
+    Writes the distinct values of a chunk of a column to path, sorted with the null first, each with
+    its index in the chunk's dictionary. Returns the dictionary index of every row, and the number
+    of distinct values.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    encoded = pc.dictionary_encode(_comparable(column), null_encoding="encode")
+    order = pc.array_sort_indices(encoded.dictionary, null_placement="at_start")
+    run = pa.table({"value": encoded.dictionary.take(order), "index": order.cast(pa.int32())})
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, run.schema) as writer:
+        writer.write_table(run)
+    return encoded.indices.to_numpy(zero_copy_only=False).astype(CODE_DTYPE), len(encoded.dictionary)
+
+
+def _run_entries(path, run):
+    import pyarrow as pa
+
+    # The run is memory-mapped and read a slice at a time
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    for batch in table.to_batches(max_chunksize=1 << 14):
+        for value, index in zip(batch.column(0).to_pylist(), batch.column(1).to_numpy()):
+            yield (value is not None, value if value is not None else ""), run, index
+
+
+def _merge_runs(run_paths, map_paths, sizes):
+    """
+    Numbers the distinct values of sorted runs in one merge, and writes for each run the code of
+    every index of its dictionary to map_paths. Returns the number of distinct values.
+    """
+    maps = [np.lib.format.open_memmap(path, mode="w+", dtype=CODE_DTYPE, shape=(size,))
+            for path, size in zip(map_paths, sizes)]
+    code = -1
+    previous = None
+    for key, run, index in heapq.merge(*(_run_entries(path, run) for run, path in enumerate(run_paths))):
+        if key != previous:
+            code += 1
+            previous = key
+        maps[run][index] = code
+    for mapping in maps:
+        mapping.flush()
+    return code + 1
+
+
+def encode_table(path, work_dir, chunk_size=100_000):
+    """
+    Reads a CSV or Parquet file in chunks and writes one file of int32 value codes per column to
+    work_dir, with columns.json listing the attributes and the number of rows. Nulls are one value,
+    and codes follow the sorted order of the values. Memory is bounded by the chunk size: values
+    are matched across chunks by merging sorted runs written to work_dir. Returns (attributes, num_rows).
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    runs_dir = tempfile.mkdtemp(prefix="runs-", dir=work_dir)
+    attributes = None
+    files = []
+    chunk_rows = []
+    sizes = []
+    try:
+        for batch in _chunks(path, chunk_size):
+            if batch.num_rows == 0:
+                continue
+            if attributes is None:
+                attributes = list(batch.schema.names)
+                files = [open(os.path.join(runs_dir, f"{i}.indices"), "wb") for i in range(len(attributes))]
+                sizes = [[] for _ in attributes]
+            c = len(chunk_rows)
+            for i, column in enumerate(batch.columns):
+                indices, size = _write_run(column, os.path.join(runs_dir, f"{i}-{c}.arrow"))
+                files[i].write(indices.tobytes())
+                sizes[i].append(size)
+            chunk_rows.append(batch.num_rows)
+        for f in files:
+            f.close()
+        if attributes is None:
+            raise ValueError(f"{path} has no rows")
+
+        for i in range(len(attributes)):
+            runs = [os.path.join(runs_dir, f"{i}-{c}.arrow") for c in range(len(chunk_rows))]
+            maps = [os.path.join(runs_dir, f"{i}-{c}.npy") for c in range(len(chunk_rows))]
+            _merge_runs(runs, maps, sizes[i])
+
+            # Second pass: replace each chunk's dictionary indices by the merged codes
+            indices = np.memmap(os.path.join(runs_dir, f"{i}.indices"), dtype=CODE_DTYPE, mode="r")
+            with open(os.path.join(work_dir, f"{i}.codes"), "wb") as out:
+                start = 0
+                for rows, map_path in zip(chunk_rows, maps):
+                    out.write(np.load(map_path, mmap_mode="r")[indices[start:start + rows]].tobytes())
+                    start += rows
+            del indices
+            for run_path, map_path in zip(runs, maps):
+                os.remove(run_path)
+                os.remove(map_path)
+    finally:
+        for f in files:
+            f.close()
+        shutil.rmtree(runs_dir, ignore_errors=True)
+
+    num_rows = sum(chunk_rows)
+    with open(os.path.join(work_dir, "columns.json"), "w") as f:
+        json.dump({"attributes": attributes, "rows": num_rows}, f)
+    return attributes, num_rows
+
+
+def load_columns(work_dir):
+    """Returns (attributes, memory-mapped code arrays) written by encode_table"""
+    with open(os.path.join(work_dir, "columns.json")) as f:
+        info = json.load(f)
+    columns = [np.memmap(os.path.join(work_dir, f"{i}.codes"), dtype=CODE_DTYPE, mode="r", shape=(info["rows"],))
+               for i in range(len(info["attributes"]))]
+    return info["attributes"], columns
+
+
+### Stripped partitions ###
+# A partition groups the rows that agree on an attribute set. Only classes with two or more rows
+# are kept (stripped), as sorted row indices and a class label per row.
+
+def _group(keys, bound):
+    """
+    Groups rows by keys in range(bound). Returns which rows are in a class of two or more, their
+    class labels numbered from 0, and the number of such classes. Counting is linear when bound is
+    small enough, sorting is the fallback.
+    """
+    if bound <= 4 * len(keys) + 1024:
+        counts = np.bincount(keys, minlength=bound)
+    else:
+        _, keys, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        keys = keys.ravel()
+    shared = counts > 1
+    ids = np.cumsum(shared, dtype=np.int64) - 1
+    keep = shared[keys]
+    return keep, ids[keys[keep]].astype(LABEL_DTYPE), int(ids[-1]) + 1 if len(ids) else 0
+
+
+class Partition:
+    def __init__(self, rows, labels, num_classes):
+        self.rows = rows
+        self.labels = labels
+        self.num_classes = num_classes
+
+    @property
+    def error(self):
+        """Rows that would have to be removed for the attribute set to be a key, ||p|| - |p|"""
+        return len(self.rows) - self.num_classes
+
+    @classmethod
+    def from_codes(cls, codes):
+        codes = np.asarray(codes)
+        keep, labels, num_classes = _group(codes, int(codes.max()) + 1 if len(codes) else 0)
+        return cls(np.flatnonzero(keep).astype(LABEL_DTYPE), labels, num_classes)
+
+    def product(self, other, table):
+        """
+        Returns the partition of the union of both attribute sets. table is a scratch array with
+        one entry per row of the relation, filled with -1, and is left that way.
+        """
+        table[other.rows] = other.labels
+        matched = table[self.rows]
+        table[other.rows] = -1
+        both = matched >= 0
+        pairs = self.labels[both].astype(np.int64) * other.num_classes + matched[both]
+        keep, labels, num_classes = _group(pairs, self.num_classes * other.num_classes)
+        return Partition(self.rows[both][keep], labels, num_classes)
+
+    def spill(self, path):
+        """Moves the arrays to a file and maps them back, to keep the partition out of memory"""
+        np.save(path, np.concatenate([self.rows, self.labels]))
+        both = np.load(path, mmap_mode="r")
+        self.rows, self.labels = both[:len(self.rows)], both[len(self.rows):]
+        return self
+
+
+### TANE ###
+
+def tane(columns, max_lhs=None, spill_dir=None):
+    """
+    Finds every minimal non-trivial functional dependency X -> A that holds in the table, where
+    columns are integer code arrays (e.g. memory maps from load_columns). Yields (lhs bitset,
+    attribute index) as soon as each is found.
+
+    The attribute lattice is searched level by level (Huhtala et al., 1999): the partition of each
+    set is the product of two of its subsets' partitions, X - A -> A holds when removing A leaves
+    the partition error unchanged, and right-hand side candidate sets prune sets that can no
+    longer give a minimal dependency, including every superkey.
+
+    With spill_dir, each level's partitions are written there and memory-mapped, so the operating
+    system can page them out; files are removed once their level is no longer needed.
+    """
+    n = len(columns)
+    num_rows = len(columns[0]) if n else 0
+    full = (1 << n) - 1
+    table = np.full(num_rows, -1, dtype=LABEL_DTYPE)
+
+    # Level 1, and the candidates of the empty set: every attribute
+    candidates = {0: full}
+    errors = {0: max(num_rows - 1, 0)}
+    spilled = {}
+
+    def store(partition, X):
+        if spill_dir is None:
+            return partition
+        path = os.path.join(spill_dir, f"partition-{X:x}.npy")
+        spilled.setdefault(bin(X).count("1"), []).append(path)
+        return partition.spill(path)
+
+    def discard(size):
+        for path in spilled.pop(size, []):
+            os.remove(path)
+
+    singles = [store(Partition.from_codes(codes), 1 << i) for i, codes in enumerate(columns)]
+    level = {1 << i: partition for i, partition in enumerate(singles)}
+    previous = {}
+    size = 1
+
+    def error_with(Y, A):
+        # The error of Y + A, a set of this level that may not have been generated
+        if Y | 1 << A not in errors:
+            errors[Y | 1 << A] = previous[Y].product(singles[A], table).error
+        return errors[Y | 1 << A]
+
+    try:
+        while level:
+            # Right-hand side candidates, and the dependencies they reveal
+            for X, partition in level.items():
+                errors[X] = partition.error
+                rhs = full
+                for A in bits(X):
+                    rhs &= candidates.get(X & ~(1 << A), 0)
+                candidates[X] = rhs
+            for X in level:
+                for A in bits(X & candidates[X]):
+                    if errors[X & ~(1 << A)] == errors[X]:
+                        yield X & ~(1 << A), A
+                        candidates[X] &= ~(1 << A)
+                        candidates[X] &= X
+
+            # Prune sets with no candidates left, and superkeys after their last dependencies: a
+            # superkey X determines every A, minimally when no X - B already does
+            for X in list(level):
+                if candidates[X] == 0:
+                    del level[X]
+                elif errors[X] == 0:
+                    for A in bits(candidates[X] & ~X):
+                        if all(errors[X & ~(1 << B)] != error_with(X & ~(1 << B), A) for B in bits(X)):
+                            yield X, A
+                    del level[X]
+
+            if max_lhs is not None and size >= max_lhs:
+                break
+
+            # Next level: join sets that share all but their highest attribute, keeping a set only if
+            # every subset one smaller survived
+            by_prefix = {}
+            for X in level:
+                by_prefix.setdefault(X & ~(1 << (X.bit_length() - 1)), []).append(X)
+            following = {}
+            for block in by_prefix.values():
+                block.sort()
+                for i, Y in enumerate(block):
+                    for Z in block[i + 1:]:
+                        X = Y | Z
+                        if all(X & ~(1 << A) in level for A in bits(X)):
+                            following[X] = store(level[Y].product(level[Z], table), X)
+
+            # Only the last level's candidates and errors are needed again
+            for X in list(candidates):
+                if bin(X).count("1") < size:
+                    del candidates[X]
+                    errors.pop(X, None)
+            # Single attributes stay for the whole search
+            if size > 2:
+                discard(size - 1)
+            previous = level
+            level = following
+            size += 1
+    finally:
+        for size in list(spilled):
+            discard(size)
+
+
+### Output ###
+
+def mine_fds(path, work_dir=None, chunk_size=100_000, max_lhs=None):
+    """
+    Discovers the minimal functional dependencies of a CSV or Parquet file, as an FDSet with a
+    single attribute on each right-hand side. Column codes go to work_dir (a temporary folder by
+    default), so memory only holds the partitions of two levels and of single attributes.
+    """
+    if work_dir is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            return mine_fds(path, tmp, chunk_size, max_lhs)
+
+    encode_table(path, work_dir, chunk_size)
+    attributes, columns = load_columns(work_dir)
+    F = FDSet(attributes)
+    for lhs, a in tane(columns, max_lhs, spill_dir=work_dir):
+        F.add(lhs, 1 << a)
+    return F
+
+
+def as_constraints(F, row1, row2):
+    """
+    Returns the dependencies as Z3 constraints over two rows, as functional_dependency builds them
+    in the notebooks, e.g. s.add(as_constraints(F, *make_rows(F.schema.attributes))).
+    """
+    from encoding import functional_dependency
+
+    names = F.schema.names
+    return [functional_dependency(row1, row2, names(lhs), names(rhs)) for lhs, rhs in F]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discover the functional dependencies of a CSV or Parquet table.")
+    parser.add_argument("path")
+    parser.add_argument("--work-dir", default=None, help="where to keep the encoded columns")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--max-lhs", type=int, default=None, help="largest left-hand side to search")
+    args = parser.parse_args(argv)
+    for fd in mine_fds(args.path, args.work_dir, args.chunk_size, args.max_lhs).describe():
+        print(fd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from z3 import Or, Solver, unsat
+
+from closure import FDSet
+from encoding import agree, functional_dependency, make_rows
+
+
+class FDSession:
+    """
+    The functional dependencies of one schema, with a persistent solver for implication queries.
+
+    Every answer is memoized by (lhs, rhs) bitsets. Adding a dependency never falsifies an
+    implication, so positive answers are kept; a negative answer is only dropped when the new
+    dependency applies to what its left-hand side determined, i.e. when it could now be positive.
+    """
+
+    def __init__(self, attributes, fds=(), sort="uninterpreted"):
+        self.F = FDSet(attributes)
+        self.schema = self.F.schema
+        self.row1, self.row2 = make_rows(self.schema.attributes, sort)
+        self.solver = Solver()
+        # (lhs, rhs) -> True, or the closure of lhs when the answer was False
+        self.memo = {}
+        self.hits = 0
+        self.checks = 0
+        for X, Y in fds:
+            self.add(X, Y)
+
+    def add(self, X, Y):
+        """Asserts X -> Y, where X and Y are attribute names, lists of names or bitsets"""
+        lhs, rhs = self.schema.mask(X), self.schema.mask(Y)
+        self.F.add(lhs, rhs)
+        names = self.schema.names
+        self.solver.add(functional_dependency(self.row1, self.row2, names(lhs), names(rhs)))
+
+        # Only a query whose left-hand side determined all of lhs, but not all of rhs, can change
+        stale = [query for query, determined in self.memo.items()
+                 if determined is not True and lhs & ~determined == 0 and rhs & ~determined]
+        for query in stale:
+            del self.memo[query]
+
+    def implies(self, X, Y):
+        """Whether the dependencies imply X -> Y, answered from the memo when possible"""
+        query = self.schema.mask(X), self.schema.mask(Y)
+        if query in self.memo:
+            self.hits += 1
+            return self.memo[query] is True
+
+        self.checks += 1
+        lhs, rhs = query
+        names = self.schema.names
+        s = self.solver
+        s.push()
+        s.add(agree(self.row1, self.row2, names(lhs)), Or([self.row1[a] != self.row2[a] for a in names(rhs)]))
+        result = s.check() == unsat
+        s.pop()
+        # Negative answers remember the closure of lhs, to know which new dependencies affect them
+        self.memo[query] = True if result else self.F.closure(lhs)
+        return result
+
+    def has_fd(self, X, Y):
+        return self.implies(X, Y)
+
+    def is_2nf(self, primary_key, non_prime_attributes):
+        """The notebook's check: every non-prime attribute depends on every key attribute"""
+        return all(self.implies(key, attribute) for attribute in non_prime_attributes for key in primary_key)
+
+    def check_3nf(self, primary_key, non_prime_attributes):
+        """The notebook's check: 2NF, and no non-prime attribute depends on another"""
+        return self.is_2nf(primary_key, non_prime_attributes) and \
+            not any(self.implies(a, b) for a in non_prime_attributes for b in non_prime_attributes if a != b)
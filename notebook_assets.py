@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import warnings
+
+# Encoded data URIs are cached here, keyed by the image's content hash, the encoding options and the encoder
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset-cache")
+
+# File signatures used to detect the real type of an image, regardless of its extension
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+# Fixed options passed to the encoder for each output format, besides the quality
+ENCODER_SETTINGS = {"webp": {"method": 6}, "png": {"optimize": True}}
+
+
+def detect_mime(data):
+    """Returns the MIME type of image data from its first bytes"""
+    for signature, mime in SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if b"<svg" in data[:1024]:
+        return "image/svg+xml"
+    raise ValueError("unrecognized image format")
+
+
+def data_uri(data, mime=None):
+    mime = mime or detect_mime(data)
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def encoder_version():
+    """Returns the encoder reencode uses, e.g. 'Pillow 10.4.0', or 'none' without Pillow"""
+    try:
+        import PIL
+    except ImportError:
+        return "none"
+    return f"Pillow {PIL.__version__}"
+
+
+def encoder_key():
+    """Returns a string that changes whenever re-encoding the same image can give different bytes"""
+    return json.dumps([encoder_version(), ENCODER_SETTINGS], sort_keys=True)
+
+
+def _encode(image, format, quality):
+    out = io.BytesIO()
+    if format == "webp":
+        image.save(out, "WEBP", quality=quality, **ENCODER_SETTINGS["webp"])
+        return out.getvalue(), "image/webp"
+    # PNG palette quantization: line drawings and plots rarely need more than a few colors
+    colors = max(2, min(256, quality * 256 // 100))
+    image.quantize(colors).save(out, "PNG", **ENCODER_SETTINGS["png"])
+    return out.getvalue(), "image/png"
+
+
+def reencode(data, format="png", max_width=None, max_bytes=None):
+    """
+    Re-encodes image data as a palette PNG or a WebP, optionally downscaled to max_width pixels.
+    If max_bytes is given, the quality (then the size) is lowered until the result fits, with a
+    warning if even the smallest encoding does not.
+    Returns (data, mime), or the original image if re-encoding does not make it smaller.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        # Pillow is optional, without it images are embedded as they are
+        return _check_size((data, detect_mime(data)), max_bytes)
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    if max_width and image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+
+    best = None
+    for scale in (1.0, 0.75, 0.5):
+        scaled = image
+        if scale < 1:
+            scaled = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                  Image.LANCZOS)
+        for quality in (90, 75, 50, 25):
+            encoded = _encode(scaled, format, quality)
+            if best is None or len(encoded[0]) < len(best[0]):
+                best = encoded
+            if max_bytes is None or len(encoded[0]) <= max_bytes:
+                break
+        if max_bytes is None or len(best[0]) <= max_bytes:
+            break
+
+    if len(best[0]) >= len(data) and not max_width:
+        best = data, detect_mime(data)
+    return _check_size(best, max_bytes)
+
+
+def _check_size(encoded, max_bytes):
+    if max_bytes is not None and len(encoded[0]) > max_bytes:
+        warnings.warn(f"image is {len(encoded[0])} bytes after re-encoding, over max_bytes={max_bytes}",
+                      stacklevel=3)
+    return encoded
+
+
+def encode_image(path, format=None, max_width=None, max_bytes=None, cache_dir=CACHE_DIR):
+    """Returns the data URI of an image file, re-encoded if a format is given, using the on-disk cache"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if format is None and max_width is None and max_bytes is None:
+        return data_uri(data)
+
+    # Without Pillow the original image is returned, which must not be served once Pillow is installed
+    options = json.dumps([format, max_width, max_bytes, encoder_key()])
+    key = hashlib.sha256(data + options.encode("utf-8")).hexdigest()
+    cached = os.path.join(cache_dir, key + ".uri")
+    if os.path.exists(cached):
+        with open(cached) as f:
+            return f.read()
+
+    uri = data_uri(*reencode(data, format or "png", max_width, max_bytes))
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cached + ".tmp", "w") as f:
+        f.write(uri)
+    os.replace(cached + ".tmp", cached)
+    return uri
+
+
+class Image:
+    """An image embedded in a notebook, only read and encoded the first time it is used"""
+
+    def __init__(self, path, format=None, max_width=None, max_bytes=None):
+        self.path = path
+        self.options = dict(format=format, max_width=max_width, max_bytes=max_bytes)
+        self._uri = None
+
+    @property
+    def uri(self):
+        if self._uri is None:
+            self._uri = encode_image(self.path, **self.options)
+        return self._uri
+
+    def __str__(self):
+        return self.uri
+
+    def __format__(self, spec):
+        return format(self.uri, spec)
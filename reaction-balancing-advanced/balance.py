@@ -0,0 +1,188 @@
+from collections import namedtuple
+from math import gcd, lcm
+
+from stoichiometry import stoichiometry_matrix, dense
+
+Balance = namedtuple("Balance", ["species", "coefficients", "nullity", "method"])
+Balance.__doc__ = """
+A balanced reaction. coefficients[j] is the coefficient of species[j], nullity is the number of
+independent ways to balance the reaction, and method is 'nullspace' or 'optimize'.
+"""
+
+SubReactions = namedtuple("SubReactions", ["basis", "nullity", "complete"])
+SubReactions.__doc__ = """
+Independent balanced sub-reactions: basis holds coefficient lists, nullity is the dimension of the
+nullspace, and complete is whether the basis spans it (len(basis) == nullity).
+"""
+
+
+def _reduce(v):
+    # Divide a vector by the gcd of its entries, keeping its sign
+    g = 0
+    for x in v:
+        g = gcd(g, x)
+    return [x // g for x in v] if g > 1 else v
+
+
+def nullspace(rows, n):
+    """
+    Returns an integer basis of the nullspace {x : A x = 0} of an integer matrix with n columns.
+    Uses fraction-free Gauss-Jordan elimination, so every step is exact and stays in the integers.
+    """
+    a = [list(row) for row in rows if any(row)]
+    pivots = []
+    for c in range(n):
+        r = len(pivots)
+        if r == len(a):
+            break
+        p = next((i for i in range(r, len(a)) if a[i][c]), None)
+        if p is None:
+            continue
+        a[r], a[p] = a[p], a[r]
+        f = a[r][c]
+        for i in range(len(a)):
+            g = a[i][c]
+            if i != r and g:
+                a[i] = _reduce([f * x - g * y for x, y in zip(a[i], a[r])])
+        pivots.append(c)
+
+    # Each free column gives one basis vector, solved from the reduced rows
+    basis = []
+    pivot_set = set(pivots)
+    for free in range(n):
+        if free in pivot_set:
+            continue
+        scale = 1
+        for k, c in enumerate(pivots):
+            if a[k][free]:
+                scale = lcm(scale, abs(a[k][c]))
+        v = [0] * n
+        v[free] = scale
+        for k, c in enumerate(pivots):
+            v[c] = -a[k][free] * scale // a[k][c]
+        basis.append(_reduce(v))
+    return basis
+
+
+# Largest coefficient the optimizer searches for, which keeps its search space finite
+DEFAULT_BOUND = 10000
+
+
+def _balance_optimizer(matrix, lower, bound, timeout):
+    from z3 import Int, Optimize, Sum
+
+    coefficients = [Int(f"c_{{{name}}}") for name in matrix.species]
+    opt = Optimize()
+    if timeout is not None:
+        opt.set("timeout", int(timeout * 1000))
+    for row in matrix.rows:
+        opt.add(Sum([n * coefficients[j] for j, n in row.items()]) == 0)
+    for coefficient in coefficients:
+        opt.add(coefficient >= lower, coefficient <= bound)
+    return opt, coefficients
+
+
+def _minimize(opt, coefficients):
+    # Objectives are ranked lexicographically: first the total, then each coefficient in order,
+    # so the answer is canonical and can be cached
+    from z3 import Sum
+
+    opt.minimize(Sum(coefficients))
+    for coefficient in coefficients:
+        opt.minimize(coefficient)
+
+
+def optimize_balance(matrix, bound=DEFAULT_BOUND, timeout=None):
+    """
+    Finds the positive integer coefficients with the smallest sum using Z3's Optimize.
+    Ties are broken lexicographically, by the first species' coefficient, then the second, ...
+    Raises TimeoutError if Z3 gives up after timeout seconds.
+    """
+    from z3 import sat, unknown
+
+    opt, coefficients = _balance_optimizer(matrix, 1, bound, timeout)
+    _minimize(opt, coefficients)
+    result = opt.check()
+    if result == unknown:
+        raise TimeoutError(f"Z3 found no balance in time ({opt.reason_unknown()})")
+    if result != sat:
+        raise ValueError(f"reaction cannot be balanced with positive coefficients up to {bound}")
+    m = opt.model()
+    return [m[c].as_long() for c in coefficients]
+
+
+def _rank(vectors):
+    return len(vectors) - len(nullspace(list(zip(*vectors)), len(vectors))) if vectors else 0
+
+
+def independent_subreactions(matrix, bound=DEFAULT_BOUND, timeout=None):
+    """
+    Returns SubReactions: independent balanced sub-reactions, as coefficient lists in which species
+    that do not take part are 0. Each one is the smallest (by coefficient sum, then
+    lexicographically) balance that involves a species not covered by the previous ones.
+
+    A single Optimize holds the balance constraints, and each query only pushes the species that
+    must take part. Sub-reactions that would need a species on the other side of the arrow, or that
+    Z3 cannot find within timeout, are missing; complete is then False and the basis is smaller
+    than the nullity.
+    """
+    from z3 import sat
+
+    dimension = len(nullspace(dense(matrix), len(matrix.species)))
+    opt, coefficients = _balance_optimizer(matrix, 0, bound, timeout)
+
+    basis = []
+    for j in range(len(coefficients)):
+        if len(basis) == dimension:
+            break
+        # Species already in a sub-reaction cannot start a new independent one on their own
+        if any(v[j] for v in basis):
+            continue
+        opt.push()
+        opt.add(coefficients[j] >= 1)
+        _minimize(opt, coefficients)
+        if opt.check() == sat:
+            m = opt.model()
+            v = [m[c].as_long() for c in coefficients]
+            if _rank(basis + [v]) > len(basis):
+                basis.append(v)
+        opt.pop()
+    return SubReactions(basis, dimension, len(basis) == dimension)
+
+
+def balance_matrix(matrix, fallback=True, timeout=None):
+    """
+    Balances a reaction given as a stoichiometry matrix.
+
+    When the nullspace is one-dimensional the answer is its smallest positive integer vector, computed
+    exactly without a solver. Only reactions with several independent balances go to Z3, which
+    picks the positive solution with the smallest coefficient sum, ties broken lexicographically
+    (unless fallback is False), within timeout seconds or raising TimeoutError.
+    """
+    n = len(matrix.species)
+    basis = nullspace(dense(matrix), n)
+    if not basis:
+        raise ValueError("reaction cannot be balanced, the only solution has all coefficients zero")
+
+    if len(basis) == 1:
+        v = basis[0]
+        if all(x < 0 for x in v):
+            v = [-x for x in v]
+        if not all(x > 0 for x in v):
+            raise ValueError("reaction cannot be balanced with positive coefficients")
+        return Balance(matrix.species, v, 1, "nullspace")
+
+    if not fallback:
+        raise ValueError(f"reaction has {len(basis)} independent balances")
+    return Balance(matrix.species, optimize_balance(matrix, timeout=timeout), len(basis), "optimize")
+
+
+def balance(reactants, products, fallback=True):
+    """Balances a reaction given as formula lists or the notebook's dictionaries"""
+    return balance_matrix(stoichiometry_matrix(reactants, products), fallback)
+
+
+def format_reaction(result, num_reactants):
+    """Returns a balanced reaction as a string, e.g. '2 H2 + O2 -> 2 H2O'"""
+    terms = [name if c == 1 else f"{c} {name}" for name, c in zip(result.species, result.coefficients)]
+    return " + ".join(terms[:num_reactants]) + " -> " + " + ".join(terms[num_reactants:])
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from balance import Balance, balance_matrix, format_reaction
+from stoichiometry import Stoichiometry, parse_reaction, stoichiometry_matrix, dense
+
+# Seconds Z3 may spend on one reaction with several independent balances
+DEFAULT_TIMEOUT = 10
+
+
+def _check_species(half, name):
+    # A list of formula strings, or the notebook's {'H2O': {'H': 2, 'O': 1}} dictionaries
+    if isinstance(half, list) and all(isinstance(s, str) for s in half):
+        return half
+    if isinstance(half, dict) and all(
+            isinstance(counts, dict) and all(isinstance(el, str) and type(n) is int for el, n in counts.items())
+            for counts in half.values()):
+        return half
+    raise ValueError(f"'{name}' must be a list of formulas or a dictionary of element counts")
+
+
+def read_reactions(lines):
+    """
+    Yields (reaction, reactants, products) for each input line, or (reaction, None, error) if it
+    cannot be parsed. A line is either a reaction string or a JSON object with a 'reaction' string,
+    or 'reactants' and 'products' in any format accepted by stoichiometry_matrix. Lines of any
+    other shape are reported as errors.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            if line.startswith("{"):
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("a JSON line must be an object")
+                if "reaction" in record:
+                    reaction = record["reaction"]
+                    if not isinstance(reaction, str):
+                        raise ValueError("'reaction' must be a string")
+                    yield (reaction, *parse_reaction(reaction))
+                elif "reactants" in record and "products" in record:
+                    yield (line, _check_species(record["reactants"], "reactants"),
+                           _check_species(record["products"], "products"))
+                else:
+                    raise ValueError("expected 'reaction', or 'reactants' and 'products'")
+            else:
+                yield (line, *parse_reaction(line))
+        except (ValueError, KeyError, TypeError) as e:
+            yield (line, None, f"could not parse reaction: {e}")
+
+
+def canonical_form(matrix):
+    """
+    Returns a hashable key shared by every reaction with the same stoichiometry matrix.
+    Elements are renamed away, so e.g. H2 + O2 -> H2O and H2 + S2 -> H2S share one balance.
+    """
+    rows = sorted(tuple(row) for row in dense(matrix))
+    return (matrix.num_reactants, tuple(rows))
+
+
+def balance_key(key, timeout=None):
+    """
+    Runs in a worker process: rebuilds a matrix from its canonical form and balances it. Returns
+    (coefficients, nullity, None), or (None, None, (status, reason)) if it could not be balanced,
+    so that no reaction can stop the others.
+    """
+    num_reactants, rows = key
+    n = len(rows[0]) if rows else 0
+    matrix = Stoichiometry(elements=[str(i) for i in range(len(rows))],
+                           species=[str(j) for j in range(n)],
+                           rows=[{j: x for j, x in enumerate(row) if x} for row in rows],
+                           num_reactants=num_reactants)
+    try:
+        result = balance_matrix(matrix, timeout=timeout)
+    except ValueError as e:
+        return None, None, ("unbalanceable", str(e))
+    except TimeoutError as e:
+        return None, None, ("unknown", str(e))
+    except Exception as e:
+        return None, None, ("error", f"{type(e).__name__}: {e}")
+    return result.coefficients, result.nullity, None
+
+
+def _result(reaction, reactants, products, balanced):
+    if reactants is None:
+        return {"reaction": reaction, "status": "error", "reason": products}
+    coefficients, nullity, failure = balanced
+    if failure is not None:
+        status, reason = failure
+        return {"reaction": reaction, "status": status, "reason": reason}
+    species = list(reactants) + list(products)
+    # (species, coefficient) pairs per side: a species may appear on both sides, or twice on one
+    pairs = [[name, c] for name, c in zip(species, coefficients)]
+    record = {
+        "reaction": reaction,
+        "status": "balanced" if nullity == 1 else "ambiguous",
+        "coefficients": {"reactants": pairs[:len(reactants)], "products": pairs[len(reactants):]},
+        "balanced": format_reaction(Balance(species, coefficients, nullity, None), len(reactants)),
+    }
+    if nullity > 1:
+        record["reason"] = (f"{nullity} independent balances, showing the one with the smallest "
+                            "coefficient sum")
+    return record
+
+
+class BalanceCache:
+    """Least recently used cache of balances, keyed by canonical stoichiometry matrix"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+def balance_stream(lines, workers=None, chunk_size=10000, cache=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Balances a stream of reactions and yields one result dictionary per reaction, in input order.
+
+    Reactions are read chunk_size at a time. Within a chunk, reactions with the same canonical
+    stoichiometry matrix are balanced once, and matrices not already in the cache are balanced in
+    a process pool. Memory is bounded by the chunk size and the cache size. A reaction Z3 cannot
+    balance within timeout seconds is reported as unknown.
+    """
+    cache = cache if cache is not None else BalanceCache()
+    reactions = read_reactions(lines)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(islice(reactions, chunk_size))
+            if not chunk:
+                return
+
+            keys = []
+            resolved = {}
+            # Corpora repeat reactions verbatim, so each distinct line is only turned into a matrix once
+            seen = {}
+            for reaction, reactants, products in chunk:
+                if reaction in seen:
+                    key, reactants, products = seen[reaction]
+                else:
+                    key = None
+                    if reactants is not None:
+                        try:
+                            key = canonical_form(stoichiometry_matrix(reactants, products))
+                        except (ValueError, TypeError) as e:
+                            reactants, products = None, f"could not parse reaction: {e}"
+                    seen[reaction] = (key, reactants, products)
+                keys.append((key, reactants, products))
+                if key is not None and key not in resolved:
+                    resolved[key] = cache.get(key)
+
+            # Small batches per task keep the pool busy without pickling one task per reaction
+            todo = [key for key, balanced in resolved.items() if balanced is None]
+            batch = max(1, len(todo) // (4 * (workers or os.cpu_count() or 1)))
+            balanced_keys = pool.map(partial(balance_key, timeout=timeout), todo, chunksize=batch)
+            for key, balanced in zip(todo, balanced_keys):
+                cache.put(key, balanced)
+                resolved[key] = balanced
+
+            for (reaction, _, _), (key, reactants, products) in zip(chunk, keys):
+                yield _result(reaction, reactants, products, resolved.get(key))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Balance a file of reactions (one per line, or JSONL) and write JSONL results in input order.")
+    parser.add_argument("input", help="input file, or - for standard input")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: standard output)")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--cache-size", type=int, default=100000)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds Z3 may spend on one ambiguous reaction (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    cache = BalanceCache(args.cache_size)
+    counts = {}
+    try:
+        for record in balance_stream(source, args.workers, args.chunk_size, cache, args.timeout):
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            sink.write(json.dumps(record) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(f"{summary} ({cache.hits} cache hits, {cache.misses} misses)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
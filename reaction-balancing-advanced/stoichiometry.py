@@ -0,0 +1,191 @@
+import re
+from collections import namedtuple
+
+# Pseudo-element used for the charge row, so ionic reactions also balance charge
+CHARGE = "charge"
+
+# Separators between the parts of a hydrate or adduct, e.g. CuSO4·5H2O or CuSO4*5H2O
+HYDRATE_SEPARATORS = "·•*."
+
+# Trailing charge: ^2+, ^-, {3-}, +2, -1, 3+, +, --. Digits right before a single sign follow the
+# usual ion notation: the charge of a single element (Fe3+, O2-), the count of the last atom of a
+# polyatomic ion (NH4+, NO3-). Anything else with more than one digit (SO42-) is ambiguous.
+CHARGE_SUFFIX = re.compile(r"(?:\^(\d*)([+-])|\{(\d*)([+-])\}|([+-])(\d+)|(\d+)([+-])|([+-]+))$")
+
+MONATOMIC = re.compile(r"[A-Z][a-z]*")
+
+TOKEN = re.compile(r"\[(\d+)([A-Z][a-z]*)\]|\^(\d+)([A-Z][a-z]*)|([A-Z][a-z]*)|([(\[{])|([)\]}])|(\d+)")
+
+CLOSING = {"(": ")", "[": "]", "{": "}"}
+
+Stoichiometry = namedtuple("Stoichiometry", ["elements", "species", "rows", "num_reactants"])
+Stoichiometry.__doc__ = """
+Sparse element x species matrix of a reaction. rows[i] maps a species index to the number of atoms
+of elements[i] in it, positive for reactants and negative for products, so balanced coefficients
+x satisfy sum(rows[i][j] * x[j]) == 0 for every element.
+"""
+
+
+def _split_charge(formula):
+    match = CHARGE_SUFFIX.search(formula)
+    if match is None or match.start() == 0:
+        return formula, 0
+    caret_size, caret_sign, brace_size, brace_sign, sign, sign_size, ion_size, ion_sign, signs = match.groups()
+    if caret_sign:
+        charge = int(caret_size or 1) * (1 if caret_sign == "+" else -1)
+    elif brace_sign:
+        charge = int(brace_size or 1) * (1 if brace_sign == "+" else -1)
+    elif sign:
+        charge = int(sign_size) * (1 if sign == "+" else -1)
+    elif ion_sign:
+        body = formula[:match.start()]
+        if MONATOMIC.fullmatch(body):
+            return body, int(ion_size) * (1 if ion_sign == "+" else -1)
+        if len(ion_size) > 1:
+            raise ValueError(f"ambiguous charge in {formula!r}, write it with a caret, e.g. SO4^2-")
+        return formula[:match.end() - 1], 1 if ion_sign == "+" else -1
+    else:
+        charge = signs.count("+") - signs.count("-")
+    return formula[:match.start()], charge
+
+
+def _parse_group(formula, tokens, pos, closing=None):
+    counts = {}
+    while pos < len(tokens):
+        match = tokens[pos]
+        iso_mass, iso_element, caret_mass, caret_element, element, opening, close, number = match.groups()
+        if close:
+            if close != closing:
+                raise ValueError(f"unbalanced {close!r} in {formula!r}")
+            return counts, pos + 1
+        if number:
+            raise ValueError(f"unexpected count {number!r} in {formula!r}")
+
+        if opening:
+            group, pos = _parse_group(formula, tokens, pos + 1, CLOSING[opening])
+        else:
+            if iso_element or caret_element:
+                # Isotopes are tracked as their own element, e.g. 13C
+                group = {(iso_mass or caret_mass) + (iso_element or caret_element): 1}
+            else:
+                group = {element: 1}
+            pos += 1
+
+        multiplier = 1
+        if pos < len(tokens) and tokens[pos].group(8):
+            multiplier = int(tokens[pos].group(8))
+            pos += 1
+        for el, n in group.items():
+            counts[el] = counts.get(el, 0) + n * multiplier
+
+    if closing is not None:
+        raise ValueError(f"missing {closing!r} in {formula!r}")
+    return counts, pos
+
+
+def _parse_part(formula, part):
+    # A hydrate part may start with a multiplier, e.g. the 5 in 5H2O
+    match = re.match(r"\d+", part)
+    multiplier = int(match.group()) if match else 1
+    body = part[match.end():] if match else part
+
+    tokens = list(TOKEN.finditer(body))
+    if not body or "".join(t.group() for t in tokens) != body:
+        raise ValueError(f"invalid formula {formula!r}")
+    counts, _ = _parse_group(formula, tokens, 0)
+    return {el: n * multiplier for el, n in counts.items()}
+
+
+def parse_formula(formula):
+    """
+    Returns the number of atoms of each element in a chemical formula, e.g. {'H': 2, 'O': 1} for H2O.
+    Supports groups (Ca(OH)2, K4[Fe(CN)6]), hydrates (CuSO4·5H2O), isotopes ([13C]O2 or ^13CO2)
+    and charges (SO4^2-, Fe{3+}, Fe3+, NH4+), which are stored under CHARGE. The electron is written e-.
+    """
+    formula = formula.strip()
+    body, charge = _split_charge(formula)
+    counts = {}
+    if body != "e":
+        for part in re.split("[" + re.escape(HYDRATE_SEPARATORS) + "]", body):
+            if not part:
+                raise ValueError(f"invalid formula {formula!r}")
+            for el, n in _parse_part(formula, part).items():
+                counts[el] = counts.get(el, 0) + n
+    elif charge == 0:
+        raise ValueError("the electron must be written with its charge, e-")
+    if charge:
+        counts[CHARGE] = charge
+    return counts
+
+
+def parse_reaction(reaction):
+    """
+    Splits a reaction such as 'C3H7OH + O2 -> CO2 + H2O' into its reactant and product formulas.
+    Coefficients already in the reaction are ignored.
+    """
+    for arrow in ("<->", "<=>", "->", "=>", "→", "="):
+        if arrow in reaction:
+            left, right = reaction.split(arrow, 1)
+            break
+    else:
+        raise ValueError(f"no arrow in reaction {reaction!r}")
+
+    def species(side):
+        # ' + ' separates species, a '+' without spaces belongs to a charge
+        names = [s.strip() for s in re.split(r"\s\+\s", f" {side.strip()} ")]
+        names = [re.sub(r"^\d+\s*(?=[A-Z(\[e^])", "", s) for s in names if s]
+        if not names:
+            raise ValueError(f"empty side in reaction {reaction!r}")
+        return names
+
+    return species(left), species(right)
+
+
+def _compositions(half):
+    # Accepts formula strings, or the notebook's {'H2O': {'H': 2, 'O': 1}} dictionaries
+    if isinstance(half, dict):
+        return list(half), [dict(half[name]) for name in half]
+    half = list(half)
+    return half, [parse_formula(name) for name in half]
+
+
+def stoichiometry_matrix(reactants, products):
+    """Builds the sparse element x species matrix of a reaction in a single pass over the species"""
+    reactant_names, reactant_counts = _compositions(reactants)
+    product_names, product_counts = _compositions(products)
+
+    element_index = {}
+    rows = []
+    for j, counts in enumerate(reactant_counts + product_counts):
+        sign = 1 if j < len(reactant_counts) else -1
+        for el, n in counts.items():
+            if el not in element_index:
+                element_index[el] = len(rows)
+                rows.append({})
+            row = rows[element_index[el]]
+            row[j] = row.get(j, 0) + sign * n
+
+    return Stoichiometry(list(element_index), reactant_names + product_names, rows, len(reactant_names))
+
+
+def dense(matrix):
+    """Returns the stoichiometry matrix as a list of lists"""
+    return [[row.get(j, 0) for j in range(len(matrix.species))] for row in matrix.rows]
+
+
+def create_reaction_solver(reactants, products):
+    """
+    Creates a solver that balances a reaction, with one flat Sum constraint per element.
+    Returns the solver and the coefficient variables, reactants first, in the order given.
+    """
+    from z3 import Int, Solver, Sum
+
+    matrix = stoichiometry_matrix(reactants, products)
+    coefficients = [Int(f"c_{{{name}}}") for name in matrix.species]
+
+    s = Solver()
+    for row in matrix.rows:
+        s.add(Sum([n * coefficients[j] for j, n in row.items()]) == 0)
+    for coefficient in coefficients:
+        s.add(coefficient >= 1)
+    return s, coefficients